@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the NetWitness MCP Server.
+
+Measures:
+  1. The `python -X importtime` breakdown of importing the server module (top N cumulative imports).
+  2. Time-to-first-response over stdio: spawn the server, send `initialize`, then `tools/list`.
+
+Exits with status 1 if the median timings exceed the configured regression budget.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--import-budget-ms 600] [--initialize-budget-ms 1000] [--tools-list-budget-ms 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+MODULE = "netwitness_mcp_server"
+
+
+def importtime_breakdown(python: str, top: int) -> tuple[float, list[tuple[int, int, str]]]:
+    """Runs `python -X importtime -c 'import <module>'` and returns total import time (ms) and the top-N imports by cumulative time."""
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+
+    total_ms = next((cum for _, cum, name in rows if name.strip() == MODULE), 0) / 1000
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return total_ms, rows[:top]
+
+
+def _rpc(proc: subprocess.Popen, message: dict) -> None:
+    proc.stdin.write(json.dumps(message) + "\n")
+    proc.stdin.flush()
+
+
+def _read_response(proc: subprocess.Popen, request_id: int) -> dict:
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError("Server exited before responding.")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            return message
+
+
+def time_to_first_response(python: str) -> tuple[float, float, int]:
+    """Spawns the server over stdio exactly as the Docker image does and returns (initialize_ms, tools_list_ms, tool_count)."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [python, "-m", MODULE],
+        cwd=SRC_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    try:
+        _rpc(proc, {
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "bench_startup", "version": "1.0"}
+            }
+        })
+        _read_response(proc, 1)
+        initialize_ms = (time.perf_counter() - started) * 1000
+
+        _rpc(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        list_started = time.perf_counter()
+        _rpc(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        tools = _read_response(proc, 2).get("result", {}).get("tools", [])
+        tools_list_ms = (time.perf_counter() - list_started) * 1000
+
+        return initialize_ms, tools_list_ms, len(tools)
+    finally:
+        proc.stdin.close()
+        proc.terminate()
+        proc.wait(timeout=5)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--python", default=sys.executable, help="Interpreter used to run the server")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts to measure")
+    parser.add_argument("--top", type=int, default=15, help="Number of imports to show in the breakdown")
+    parser.add_argument("--import-budget-ms", type=float, default=600.0)
+    parser.add_argument("--initialize-budget-ms", type=float, default=1000.0)
+    parser.add_argument("--tools-list-budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    import_ms, top_imports = importtime_breakdown(args.python, args.top)
+    print(f"Import breakdown for {MODULE} (top {args.top} by cumulative time):")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cumulative_us, name in top_imports:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    import_runs, initialize_runs, tools_list_runs = [], [], []
+    tool_count = 0
+    for _ in range(args.runs):
+        import_runs.append(importtime_breakdown(args.python, 0)[0])
+        initialize_ms, tools_list_ms, tool_count = time_to_first_response(args.python)
+        initialize_runs.append(initialize_ms)
+        tools_list_runs.append(tools_list_ms)
+
+    results = [
+        ("import", statistics.median(import_runs), args.import_budget_ms),
+        ("initialize (spawn to first response)", statistics.median(initialize_runs), args.initialize_budget_ms),
+        (f"tools/list ({tool_count} tools)", statistics.median(tools_list_runs), args.tools_list_budget_ms),
+    ]
+
+    print(f"\nMedian over {args.runs} cold starts:")
+    failed = False
+    for label, median_ms, budget_ms in results:
+        status = "OK" if median_ms <= budget_ms else "OVER BUDGET"
+        failed |= median_ms > budget_ms
+        print(f"- {label}: {median_ms:.1f} ms (budget {budget_ms:.0f} ms) {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Transfer and decode benchmark for the NetWitness MCP Server.
+
+Serves SDK-style msg=values and msg=query JSON responses of several sizes from a local mock upstream,
+and for every content encoding the client can negotiate (identity, gzip, deflate, and br when brotli is installed) measures:
+  1. Bytes on the wire and the compression ratio.
+  2. Median time to fetch and decode one response with httpx.
+  3. Median JSON decode time with the stdlib parser and with orjson (when installed).
+
+Usage:
+    python benchmarks/bench_transfer.py [--sizes 1000,10000,100000] [--runs 5]
+"""
+import argparse
+import gzip
+import json
+import statistics
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODERS = {
+    "identity": lambda data: data,
+    "gzip": lambda data: gzip.compress(data, compresslevel=6),
+    "deflate": lambda data: zlib.compress(data, 6),
+}
+if brotli is not None:
+    ENCODERS["br"] = lambda data: brotli.compress(data, quality=5)
+
+
+def values_payload(size: int) -> bytes:
+    """A msg=values response for alias.host with `size` values, shaped like the Concentrator's JSON."""
+    fields = [
+        {"id1": i + 1, "id2": i + 1, "count": 1 + (i * 7919) % 5000, "format": 65, "value": f"host{i:07d}.example.com",
+         "type": "alias.host", "flags": 0, "group": 0}
+        for i in range(size)
+    ]
+    return json.dumps({"flags": 0, "results": {"id1": 1, "id2": size, "fields": fields}}).encode()
+
+
+def sessions_payload(size: int) -> bytes:
+    """A msg=query response with `size` meta fields spread over sessions of five fields each."""
+    keys = [("ip.src", 128), ("ip.dst", 128), ("service", 2), ("alias.host", 65), ("time", 32)]
+    fields = []
+    for i in range(size):
+        key, fmt = keys[i % len(keys)]
+        value = {"ip.src": f"10.0.{i % 256}.{i % 200}", "ip.dst": f"192.168.{i % 16}.{i % 250}", "service": 443,
+                 "alias.host": f"host{i % 5000:05d}.example.com", "time": 1700000000 + i}[key]
+        fields.append({"id1": i + 1, "id2": i + 1, "count": 0, "format": fmt, "value": value, "type": key,
+                       "flags": 0, "group": 1000000 + i // len(keys)})
+    return json.dumps({"flags": 0, "results": {"id1": 1, "id2": size, "fields": fields}}).encode()
+
+
+class MockUpstream:
+    """Serves precompressed payloads at /sdk?msg=<values|query>&size=<n>, honouring the request's Accept-Encoding."""
+
+    def __init__(self, sizes: list[int]):
+        self.payloads = {}
+        for size in sizes:
+            for msg, build in (("values", values_payload), ("query", sessions_payload)):
+                raw = build(size)
+                self.payloads[(msg, size)] = {name: encode(raw) for name, encode in ENCODERS.items()}
+
+        payloads = self.payloads
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = dict(part.split("=", 1) for part in self.path.split("?", 1)[1].split("&"))
+                variants = payloads[(query["msg"], int(query["size"]))]
+                accepted = [item.split(";")[0].strip() for item in self.headers.get("Accept-Encoding", "").split(",")]
+                encoding = next((name for name in accepted if name in variants and name != "identity"), "identity")
+                body = variants[encoding]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if encoding != "identity":
+                    self.send_header("Content-Encoding", encoding)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+
+def median_ms(func, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated numbers of values / meta fields per response")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measurement (median is reported)")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    upstream = MockUpstream(sizes)
+    print(f"Decoders: stdlib json{', orjson' if orjson else ''} | Encodings: {', '.join(ENCODERS)}")
+    print(f"{'response':<10} {'size':>8} {'encoding':<9} {'wire bytes':>12} {'ratio':>6} {'fetch ms':>9} {'json ms':>8} {'orjson ms':>10}")
+    try:
+        with httpx.Client() as client:
+            for msg in ("values", "query"):
+                for size in sizes:
+                    raw = upstream.payloads[(msg, size)]["identity"]
+                    json_ms = median_ms(lambda: json.loads(raw), args.runs)
+                    orjson_ms = median_ms(lambda: orjson.loads(raw), args.runs) if orjson else None
+                    for encoding in ENCODERS:
+                        url = f"{upstream.url}/sdk?msg={msg}&size={size}"
+                        headers = {"Accept-Encoding": encoding}
+                        wire_bytes = client.get(url, headers=headers).num_bytes_downloaded
+                        loads = orjson.loads if orjson else json.loads
+                        fetch_ms = median_ms(lambda: loads(client.get(url, headers=headers).content), args.runs)
+                        print(
+                            f"{msg:<10} {size:>8} {encoding:<9} {wire_bytes:>12,} {len(raw) / wire_bytes:>5.1f}x {fetch_ms:>9.1f} "
+                            f"{json_ms:>8.1f} {orjson_ms if orjson_ms is not None else float('nan'):>10.1f}"
+                        )
+    finally:
+        upstream.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
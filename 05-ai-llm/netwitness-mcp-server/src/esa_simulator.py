@@ -0,0 +1,117 @@
+"""
+ESA rule simulator - Replays historical sessions through a grouped, windowed distinct-count detection, the way ESA evaluates
+rules such as 01-content/esa-rules/Kerberos_Account_Scanning:
+
+    @Hint('reclaim_group_aged=120')
+    SELECT window(*) FROM Event(...).std:groupwin(ip_src).win:time_length_batch(60 seconds, 20).std:unique(ad_username_src)
+    group by ip_src having count(*) >= 10 output first every 30 min;
+
+Per group, a batch opens on its first event and is evaluated when either `window_seconds` have passed since it opened or
+`batch_size` events were collected, whichever comes first. The batch fires when it holds at least `threshold` distinct
+values, after which the group is silenced for `suppress_seconds` (output first every ...). Groups idle for longer than
+`reclaim_aged_seconds` are dropped (reclaim_group_aged), so memory is bounded by the number of recently active groups.
+The output rate limit is tracked separately and survives reclaiming, only for groups still within their silence period.
+"""
+from collections import OrderedDict
+
+
+class _GroupState:
+    __slots__ = ("batch_start", "events", "distinct", "last_seen")
+
+    def __init__(self):
+        self.batch_start = None
+        self.events = 0
+        self.distinct = set()
+        self.last_seen = 0.0
+
+
+class GroupedWindowSimulator:
+    """Incremental groupwin / time_length_batch / unique / having count(*) >= threshold evaluation over a time-ordered event stream."""
+
+    def __init__(self, window_seconds: float, batch_size: int, threshold: int, suppress_seconds: float = 0,
+                 reclaim_aged_seconds: float | None = None, max_groups: int = 1_000_000, sample_size: int = 5):
+        self.window_seconds = window_seconds
+        self.batch_size = batch_size
+        self.threshold = threshold
+        self.suppress_seconds = suppress_seconds
+        self.reclaim_aged_seconds = reclaim_aged_seconds
+        self.max_groups = max_groups
+        self.sample_size = sample_size
+        # Ordered by last activity, so aged groups are always at the front
+        self.groups: OrderedDict = OrderedDict()
+        # group -> end of its output rate limit, ordered by expiry (firings happen in time order per group)
+        self.suppressed: OrderedDict = OrderedDict()
+        self.clock = float("-inf")
+        self.stats = {"events": 0, "late_events": 0, "batches": 0, "firings": 0, "suppressed": 0,
+                      "groups_reclaimed": 0, "groups_dropped": 0, "peak_groups": 0}
+
+    def _close_batch(self, group, state: _GroupState, at: float, firings: list) -> None:
+        self.stats["batches"] += 1
+        if len(state.distinct) >= self.threshold:
+            if at >= self.suppressed.get(group, float("-inf")):
+                self.stats["firings"] += 1
+                firings.append({"time": at, "group": group, "distinct": len(state.distinct), "events": state.events,
+                                "sample": sorted(map(str, state.distinct))[:self.sample_size]})
+                if self.suppress_seconds > 0:
+                    self.suppressed.pop(group, None)
+                    self.suppressed[group] = at + self.suppress_seconds
+            else:
+                self.stats["suppressed"] += 1
+        state.batch_start = None
+        state.events = 0
+        state.distinct = set()
+
+    def _expire(self, now: float, firings: list) -> None:
+        # A still-open batch can close up to one window plus the reclaim age in the past, keep limits that long
+        horizon = now - self.window_seconds - (self.reclaim_aged_seconds or 0)
+        while self.suppressed and next(iter(self.suppressed.values())) <= horizon:
+            self.suppressed.popitem(last=False)
+        while self.groups:
+            group, state = next(iter(self.groups.items()))
+            aged = self.reclaim_aged_seconds is not None and now - state.last_seen > self.reclaim_aged_seconds
+            if not aged and len(self.groups) <= self.max_groups:
+                return
+            if state.batch_start is not None:
+                self._close_batch(group, state, min(state.batch_start + self.window_seconds, now), firings)
+            del self.groups[group]
+            self.stats["groups_reclaimed" if aged else "groups_dropped"] += 1
+
+    def process(self, timestamp: float, group, values) -> list[dict]:
+        """Feeds one event (a session) for a group with its distinct-field values. Returns any firings it caused."""
+        firings = []
+        if timestamp < self.clock:
+            # Sessions arrive roughly in time order; late ones are evaluated at the current clock
+            self.stats["late_events"] += 1
+            timestamp = self.clock
+        self.clock = timestamp
+        self.stats["events"] += 1
+
+        state = self.groups.get(group)
+        if state is None:
+            state = self.groups[group] = _GroupState()
+        else:
+            self.groups.move_to_end(group)
+
+        if state.batch_start is not None and timestamp >= state.batch_start + self.window_seconds:
+            self._close_batch(group, state, state.batch_start + self.window_seconds, firings)
+        if state.batch_start is None:
+            state.batch_start = timestamp
+
+        state.events += 1
+        state.distinct.update(values)
+        state.last_seen = timestamp
+        if state.events >= self.batch_size:
+            self._close_batch(group, state, timestamp, firings)
+
+        self.stats["peak_groups"] = max(self.stats["peak_groups"], len(self.groups))
+        self._expire(timestamp, firings)
+        return firings
+
+    def finish(self) -> list[dict]:
+        """Evaluates the batches still open at the end of the stream (as if their window elapsed)."""
+        firings = []
+        for group, state in self.groups.items():
+            if state.batch_start is not None:
+                self._close_batch(group, state, state.batch_start + self.window_seconds, firings)
+        self.groups.clear()
+        return firings
@@ -0,0 +1,287 @@
+"""
+Offline IOC index - Matches IPs, CIDRs and domains from local indicator feeds without any network access.
+
+Feeds are plain text files (one indicator per line, '#' comments, CSV lines use the first column) in a feed directory.
+The feed name used in matches is the file name without its extension.
+
+The feeds are compiled once into a binary index file that is memory-mapped for lookups:
+  - IPv4 / IPv6: disjoint sorted intervals (start, end, label), searched with a binary search.
+  - Domains: sorted 64-bit hashes of the indicator domains, matched against every parent suffix of a host.
+The index file records a fingerprint (name, size, mtime) of the feeds, so a reload only re-parses the feeds
+when one of them changed; otherwise the existing index is simply re-mapped.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_right
+
+logger = logging.getLogger("netwitness-mcp-server.ioc")
+
+MAGIC = b"NWIOC1" + (b"LE" if sys.byteorder == "little" else b"BE")
+# magic, fingerprint, n_v4, n_v6, n_domains, labels_length
+HEADER = struct.Struct("<8s32sQQQQ")
+V6_RECORD = 16
+
+
+def _domain_hash(domain: str) -> int:
+    return int.from_bytes(hashlib.blake2b(domain.encode(), digest_size=8).digest(), "little")
+
+
+def _normalize_domain(value: str) -> str:
+    value = value.strip().lower().rstrip(".")
+    if value.startswith("*."):
+        value = value[2:]
+    return value
+
+
+def _parse_indicator(token: str) -> tuple[str, int, int] | tuple[str, str] | None:
+    """Parses a feed token into ('v4'|'v6', start, end) for IPs/CIDRs or ('domain', name). Returns None if invalid."""
+    address, _, prefix = token.partition("/")
+    for family, kind, bits in ((socket.AF_INET, "v4", 32), (socket.AF_INET6, "v6", 128)):
+        try:
+            start = int.from_bytes(socket.inet_pton(family, address), "big")
+        except OSError:
+            continue
+        try:
+            length = int(prefix) if prefix else bits
+        except ValueError:
+            return None
+        if not 0 <= length <= bits:
+            return None
+        host_bits = bits - length
+        start = (start >> host_bits) << host_bits
+        return kind, start, start + (1 << host_bits) - 1
+
+    domain = _normalize_domain(token)
+    if prefix or not domain or "." not in domain or any(c in domain for c in " :@"):
+        return None
+    return "domain", domain
+
+
+def _disjoint_intervals(intervals: list[tuple[int, int, int]]) -> list[tuple[int, int, frozenset]]:
+    """Sweeps possibly overlapping (start, end, feed_id) intervals into disjoint (start, end, feed_ids) segments."""
+    events = []
+    for start, end, feed_id in intervals:
+        events.append((start, 1, feed_id))
+        events.append((end + 1, -1, feed_id))
+    events.sort()
+
+    segments = []
+    active: dict[int, int] = {}
+    position = None
+    for point, delta, feed_id in events:
+        if position is not None and point > position and active:
+            feeds = frozenset(active)
+            if segments and segments[-1][2] == feeds and segments[-1][1] == position - 1:
+                segments[-1] = (segments[-1][0], point - 1, feeds)
+            else:
+                segments.append((position, point - 1, feeds))
+        position = point
+        active[feed_id] = active.get(feed_id, 0) + delta
+        if not active[feed_id]:
+            del active[feed_id]
+    return segments
+
+
+def feed_files(feed_dir: str) -> list[str]:
+    """Returns the sorted list of feed file paths in feed_dir (hidden files are ignored)."""
+    return sorted(
+        os.path.join(feed_dir, name) for name in os.listdir(feed_dir)
+        if not name.startswith(".") and os.path.isfile(os.path.join(feed_dir, name))
+    )
+
+
+def feeds_fingerprint(paths: list[str]) -> bytes:
+    """Hashes the name, size and modification time of every feed file."""
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.digest()
+
+
+def compile_index(paths: list[str], index_path: str, fingerprint: bytes) -> dict:
+    """Parses the feed files and writes the binary index to index_path (atomically). Returns build statistics."""
+    feed_names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    v4_intervals, v6_intervals = [], []
+    domains: dict[int, set[int]] = {}
+    skipped = 0
+
+    for feed_id, path in enumerate(paths):
+        with open(path, encoding="utf-8", errors="replace") as feed:
+            for line in feed:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                token = line.split(",", 1)[0].split()[0].strip("\"'")
+                indicator = _parse_indicator(token)
+                if indicator is None:
+                    skipped += 1
+                elif indicator[0] == "v4":
+                    v4_intervals.append((indicator[1], indicator[2], feed_id))
+                elif indicator[0] == "v6":
+                    v6_intervals.append((indicator[1], indicator[2], feed_id))
+                else:
+                    domains.setdefault(_domain_hash(indicator[1]), set()).add(feed_id)
+
+    labels: dict[frozenset, int] = {}
+
+    def label_id(feeds) -> int:
+        return labels.setdefault(frozenset(feeds), len(labels))
+
+    v4_segments = _disjoint_intervals(v4_intervals)
+    v6_segments = _disjoint_intervals(v6_intervals)
+    domain_hashes = sorted(domains)
+
+    v4_starts = array("I", (start for start, _, _ in v4_segments))
+    v4_ends = array("I", (end for _, end, _ in v4_segments))
+    v4_labels = array("I", (label_id(feeds) for _, _, feeds in v4_segments))
+    v6_starts = b"".join(start.to_bytes(V6_RECORD, "big") for start, _, _ in v6_segments)
+    v6_ends = b"".join(end.to_bytes(V6_RECORD, "big") for _, end, _ in v6_segments)
+    v6_labels = array("I", (label_id(feeds) for _, _, feeds in v6_segments))
+    domain_keys = array("Q", domain_hashes)
+    domain_labels = array("I", (label_id(domains[key]) for key in domain_hashes))
+
+    label_names = [None] * len(labels)
+    for feeds, index in labels.items():
+        label_names[index] = sorted(feed_names[feed_id] for feed_id in feeds)
+    labels_blob = json.dumps(label_names).encode()
+
+    # A unique temp file next to the index, so concurrent compiles never write to the same file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_path)), prefix=f"{os.path.basename(index_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(HEADER.pack(MAGIC, fingerprint, len(v4_segments), len(v6_segments), len(domain_hashes), len(labels_blob)))
+            # 64-bit keys first so they stay 8-byte aligned after the header
+            for section in (domain_keys, domain_labels, v4_starts, v4_ends, v4_labels, v6_labels):
+                out.write(section.tobytes())
+            out.write(v6_starts)
+            out.write(v6_ends)
+            out.write(labels_blob)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return {
+        "feeds": len(paths),
+        "ipv4_ranges": len(v4_segments),
+        "ipv6_ranges": len(v6_segments),
+        "domains": len(domain_hashes),
+        "skipped_lines": skipped,
+    }
+
+
+class IOCIndex:
+    """A memory-mapped, read-only view of a compiled IOC index file."""
+
+    def __init__(self, index_path: str):
+        with open(index_path, "rb") as index_file:
+            self._mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.fingerprint, n_v4, n_v6, n_domains, labels_length = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{index_path} is not an IOC index for this platform.")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def take(count: int, itemsize: int, fmt: str | None):
+            nonlocal offset
+            section = view[offset:offset + count * itemsize]
+            offset += count * itemsize
+            return section.cast(fmt) if fmt else section
+
+        self._domain_keys = take(n_domains, 8, "Q")
+        self._domain_labels = take(n_domains, 4, "I")
+        self._v4_starts = take(n_v4, 4, "I")
+        self._v4_ends = take(n_v4, 4, "I")
+        self._v4_labels = take(n_v4, 4, "I")
+        self._v6_labels = take(n_v6, 4, "I")
+        # IPv6 bounds are compared as 16-byte big-endian strings sliced straight from the map
+        self._v6_starts_offset = offset
+        self._v6_ends_offset = offset + n_v6 * V6_RECORD
+        offset += 2 * n_v6 * V6_RECORD
+        self._n_v6 = n_v6
+        self._labels = [", ".join(names) for names in json.loads(bytes(take(labels_length, 1, None)))]
+        self.stats = {"ipv4_ranges": n_v4, "ipv6_ranges": n_v6, "domains": n_domains}
+
+    @classmethod
+    def load(cls, feed_dir: str, index_path: str) -> "IOCIndex":
+        """Maps the index for the feeds in feed_dir, compiling it first if it is missing or the feeds changed."""
+        paths = feed_files(feed_dir)
+        fingerprint = feeds_fingerprint(paths)
+        try:
+            index = cls(index_path)
+            if index.fingerprint == fingerprint:
+                return index
+            index.close()
+        except (OSError, ValueError, struct.error):
+            pass
+
+        logger.info(f"Compiling IOC index from {len(paths)} feed(s) in {feed_dir}...")
+        stats = compile_index(paths, index_path, fingerprint)
+        logger.info(f"IOC index compiled: {stats}")
+        return cls(index_path)
+
+    def close(self) -> None:
+        for name in ("_v4_starts", "_v4_ends", "_v4_labels", "_v6_labels", "_domain_keys", "_domain_labels"):
+            getattr(self, name).release()
+        self._mmap.close()
+
+    def _match_v6(self, key: bytes) -> str | None:
+        data, starts, ends = self._mmap, self._v6_starts_offset, self._v6_ends_offset
+        low, high = 0, self._n_v6
+        while low < high:
+            middle = (low + high) // 2
+            if key < data[starts + middle * V6_RECORD:starts + (middle + 1) * V6_RECORD]:
+                high = middle
+            else:
+                low = middle + 1
+        index = low - 1
+        if index >= 0 and key <= data[ends + index * V6_RECORD:ends + (index + 1) * V6_RECORD]:
+            return self._labels[self._v6_labels[index]]
+        return None
+
+    def match_ip(self, value: str) -> str | None:
+        """Returns the comma-separated feed names whose IPs/CIDRs contain value, or None."""
+        try:
+            key = int.from_bytes(socket.inet_pton(socket.AF_INET, value), "big")
+        except OSError:
+            try:
+                return self._match_v6(socket.inet_pton(socket.AF_INET6, value))
+            except OSError:
+                return None
+        index = bisect_right(self._v4_starts, key) - 1
+        if index >= 0 and key <= self._v4_ends[index]:
+            return self._labels[self._v4_labels[index]]
+        return None
+
+    def match_domain(self, value: str) -> str | None:
+        """Returns the feed names listing value or one of its parent domains, or None."""
+        domain = _normalize_domain(value)
+        keys = self._domain_keys
+        while "." in domain:
+            key = _domain_hash(domain)
+            index = bisect_right(keys, key) - 1
+            if index >= 0 and keys[index] == key:
+                return self._labels[self._domain_labels[index]]
+            domain = domain.split(".", 1)[1]
+        return None
+
+    def match(self, value: str) -> str | None:
+        """Matches value as an IP address, or as a domain if it is not one."""
+        if ":" in value or value[-1:].isdigit():
+            try:
+                socket.inet_pton(socket.AF_INET6 if ":" in value else socket.AF_INET, value)
+                return self.match_ip(value)
+            except OSError:
+                pass
+        return self.match_domain(value)
@@ -2,13 +2,30 @@
 """
 NetWitness MCP Server - Queries metadata from a NetWitness Concentrator or Broker and Alerts data from the Admin Server API.
 """
+# Keep module-level imports light: a new container (and interpreter) is started for every client session.
+# Optional subsystems are imported inside the tools that use them.
 import os
 import sys
+import time
+import asyncio
 import logging
+import tempfile
+import json
+import functools
+import inspect
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime, timezone, timedelta
 import httpx
 from mcp.server.fastmcp import FastMCP
 from urllib.parse import quote_plus
+from profiling import phase, trace_request
+
+# orjson decodes large values/session pages several times faster than the stdlib parser; it is optional
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 # Configure logging to stderr
 logging.basicConfig(
@@ -18,8 +35,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger("netwitness-mcp-server")
 
+@asynccontextmanager
+async def server_lifespan(server):
+    """Runs the standing-query prefetcher and the event loop lag monitor (if configured) for as long as the server is up."""
+    background = [task for task in (start_prefetcher(), start_loop_lag_monitor()) if task is not None]
+    try:
+        yield {}
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+
 # Initialize MCP server
-mcp = FastMCP("netwitness")
+mcp = FastMCP("netwitness", lifespan=server_lifespan)
 
 # Configuration
 API_URL = os.environ.get("NETWITNESS_API_URL", "")
@@ -28,13 +56,52 @@ API_PASSWORD = os.environ.get("NETWITNESS_PASSWORD", "")
 NW_ADMIN_URL = os.environ.get("NW_ADMIN_URL", "")
 NW_ADMIN_USERNAME = os.environ.get("NW_ADMIN_USERNAME", "")
 NW_ADMIN_PASSWORD = os.environ.get("NW_ADMIN_PASSWORD", "")
+NW_IOC_FEED_DIR = os.environ.get("NW_IOC_FEED_DIR", "")
+NW_IOC_INDEX_PATH = os.environ.get("NW_IOC_INDEX_PATH", os.path.join(tempfile.gettempdir(), "netwitness-ioc-index.bin"))
+NW_IOC_RELOAD_SECONDS = int(os.environ.get("NW_IOC_RELOAD_SECONDS", "60"))
+NW_EXPORT_DIR = os.environ.get("NW_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "netwitness-exports"))
+NW_EXPORT_PAGE_SIZE = int(os.environ.get("NW_EXPORT_PAGE_SIZE", "10000"))
+NW_VALUES_PAGE_SIZE = int(os.environ.get("NW_VALUES_PAGE_SIZE", "10000"))
+NW_VALUES_MAX_PAGES = int(os.environ.get("NW_VALUES_MAX_PAGES", "100"))
+NW_DIFF_EXACT_VALUES = int(os.environ.get("NW_DIFF_EXACT_VALUES", "200000"))
+NW_PIVOT_MAX_URL_LENGTH = int(os.environ.get("NW_PIVOT_MAX_URL_LENGTH", "4000"))
+NW_PIVOT_CONCURRENCY = int(os.environ.get("NW_PIVOT_CONCURRENCY", "4"))
+NW_PROFILE_CACHE_SECONDS = int(os.environ.get("NW_PROFILE_CACHE_SECONDS", "300"))
+NW_NARROW_MAX_WINDOWS = int(os.environ.get("NW_NARROW_MAX_WINDOWS", "16"))
+NW_NARROW_CONCURRENCY = int(os.environ.get("NW_NARROW_CONCURRENCY", "4"))
+NW_TOOL_DEADLINE_SECONDS = float(os.environ.get("NW_TOOL_DEADLINE_SECONDS", "60"))
+NW_STREAM_DEADLINE_SECONDS = float(os.environ.get("NW_STREAM_DEADLINE_SECONDS", "900"))
+NW_SUMMARY_MAX_CHARS = int(os.environ.get("NW_SUMMARY_MAX_CHARS", "6000"))
+NW_SUMMARY_SAMPLE_SIZE = int(os.environ.get("NW_SUMMARY_SAMPLE_SIZE", "5"))
+NW_PROFILE_DIR = os.environ.get("NW_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "netwitness-profiles"))
+NW_LOOP_LAG_INTERVAL_MS = int(os.environ.get("NW_LOOP_LAG_INTERVAL_MS", "500"))
+NW_LOOP_LAG_WARN_MS = int(os.environ.get("NW_LOOP_LAG_WARN_MS", "250"))
+NW_STANDING_QUERIES = os.environ.get("NW_STANDING_QUERIES", "")
+NW_PREFETCH_INTERVAL_SECONDS = int(os.environ.get("NW_PREFETCH_INTERVAL_SECONDS", "300"))
+NW_PREFETCH_MAX_AGE_SECONDS = int(os.environ.get("NW_PREFETCH_MAX_AGE_SECONDS", "900"))
+NW_PREFETCH_STAGGER_SECONDS = int(os.environ.get("NW_PREFETCH_STAGGER_SECONDS", "30"))
+NW_PREFETCH_CONCURRENCY = int(os.environ.get("NW_PREFETCH_CONCURRENCY", "1"))
+
+# Meta keys whose values are matched against the offline IOC feeds
+IOC_ENRICHED_KEYS = {"ip.src", "ip.dst", "alias.host"}
+
+# Alert group-by fields pivoted to session meta keys by pivot_alerts_to_sessions
+ALERT_PIVOT_FIELDS = {
+    "groupby_source_ip": "ip.src",
+    "groupby_destination_ip": "ip.dst",
+    "groupby_domain": "alias.host",
+}
+
+# Meta keys whose values are never quoted in a where clause (IP addresses, MAC addresses and numbers)
+UNQUOTED_META_PREFIXES = (
+    "ip.", "ipv6.", "alias.ip", "alias.ipv6", "alias.mac", "eth.", "tcp.", "udp.", "icmp.", "latdec.", "longdec.",
+    "service", "size", "payload", "streams", "medium", "sessionid", "threat.score", "result.code"
+)
 
 # === HELPER FUNCTIONS ===
-def calculate_start_time(time_range: str) -> tuple[str, str]:
-    """Converts NetWitness-style time_range (e.g., '2d', '1h', '30m') to ISO 8601 start/end times required by the Alert API."""
-    now_utc = datetime.now(timezone.utc)
-    # The API requires ISO 8601 format: YYYY-MM-DDTHH:MM:SS.SSSZ [cite: 365, 366]
-    end_time = now_utc.replace(microsecond=0).isoformat().replace('+00:00', 'Z')
+def calculate_time_window(time_range: str) -> tuple[datetime, datetime]:
+    """Converts NetWitness-style time_range (e.g., '2d', '1h', '30m') to absolute UTC start/end datetimes (whole seconds)."""
+    now_utc = datetime.now(timezone.utc).replace(microsecond=0)
     
     duration_map = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
     
@@ -51,11 +118,637 @@ def calculate_start_time(time_range: str) -> tuple[str, str]:
     else:
         kwargs['hours'] = 1
 
-    start_time_dt = now_utc - timedelta(**kwargs)
-    start_time = start_time_dt.replace(microsecond=0).isoformat().replace('+00:00', 'Z')
+    return now_utc - timedelta(**kwargs), now_utc
+
+def calculate_start_time(time_range: str) -> tuple[str, str]:
+    """Converts NetWitness-style time_range (e.g., '2d', '1h', '30m') to ISO 8601 start/end times required by the Alert API."""
+    start_time_dt, end_time_dt = calculate_time_window(time_range)
+    # The API requires ISO 8601 format: YYYY-MM-DDTHH:MM:SS.SSSZ [cite: 365, 366]
+    start_time = start_time_dt.isoformat().replace('+00:00', 'Z')
+    end_time = end_time_dt.isoformat().replace('+00:00', 'Z')
     
     return start_time, end_time
 
+def absolute_time_filter(start_dt: datetime, end_dt: datetime) -> str:
+    """Builds a where-clause time filter for a fixed UTC window, e.g. time="2025-Sep-26 10:00:00"-"2025-Sep-26 11:00:00"."""
+    return f'time="{start_dt.strftime("%Y-%b-%d %H:%M:%S")}"-"{end_dt.strftime("%Y-%b-%d %H:%M:%S")}"'
+
+def combine_where(where_clause: str, time_filter: str) -> str:
+    """Joins an optional user where clause with a time filter."""
+    return f"{where_clause.strip()} && {time_filter}" if where_clause.strip() else time_filter
+
+def meta_value_literal(meta_key: str, value) -> str:
+    """Formats a meta value for a where clause: IPs, MACs and numbers unquoted, text quoted."""
+    if isinstance(value, (int, float)) or meta_key.startswith(UNQUOTED_META_PREFIXES):
+        return str(value)
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+class DeadlineExceeded(Exception):
+    """Raised when a tool call has no time left in its deadline for another upstream request."""
+
+class Deadline:
+    """The time budget of one tool call. A small reserve is kept back from upstream requests so there is
+    always time left to format the results collected so far."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.reserve = min(2.0, seconds * 0.1)
+
+    def remaining(self) -> float:
+        return self.expires_at - self.reserve - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """Returns the timeout for one upstream request: cap seconds, shortened to the remaining budget."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"the {self.seconds:g}s deadline of this call was reached")
+        return min(cap, remaining)
+
+# Deadline of the tool call being served. Tasks copy the context they are created in, so the fan-out
+# subtasks of a call (asyncio.gather, create_task) share its deadline.
+_deadline: ContextVar[Deadline | None] = ContextVar("deadline", default=None)
+
+def start_deadline(deadline_seconds: float, default: float = NW_TOOL_DEADLINE_SECONDS) -> Deadline:
+    """Starts the deadline of the current tool call: the caller's deadline_seconds if positive, else the default."""
+    deadline = Deadline(deadline_seconds if deadline_seconds > 0 else default)
+    _deadline.set(deadline)
+    return deadline
+
+# Timeout of the Admin Server token request, shorter than the 30s of data requests
+AUTH_TIMEOUT_SECONDS = 10
+
+def request_timeout(cap: float = 30) -> float:
+    """Timeout for one upstream request: cap seconds, or less when the current call's deadline is closer."""
+    deadline = _deadline.get()
+    return deadline.timeout(cap) if deadline is not None else cap
+
+def deadline_expired() -> bool:
+    """True when the current tool call has no time left for further upstream requests."""
+    deadline = _deadline.get()
+    return deadline is not None and deadline.expired()
+
+def deadline_error(e: Exception, request_cap: float = 30) -> str:
+    """Formats the error returned when a call times out before it has any result to return. request_cap is the
+    timeout the failed request was given (its request_timeout cap)."""
+    deadline = _deadline.get()
+    budget = f"{deadline.seconds:g}s" if deadline is not None else "no"
+    return (
+        f"❌ Timeout: NetWitness did not answer in time ({budget} call deadline, at most {request_cap:g}s per request; {str(e) or type(e).__name__}). "
+        f"Narrow the query or time range, or pass a larger deadline_seconds."
+    )
+
+async def gather_or_cancel(*aws):
+    """Like asyncio.gather, but cancels the remaining awaitables as soon as one of them fails, so a failed or
+    timed-out fan-out does not leave sibling queries running against the Concentrator."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def feed_queue(queue: asyncio.Queue, items) -> None:
+    """Producer side of a bounded producer/consumer pipeline: puts every item of the async iterable on the queue, then
+    a None sentinel, also when fetching fails so the consumer stops (the error is re-raised when the producer task is
+    awaited). A cancelled producer puts no sentinel: it is cancelled because the consumer stopped reading, and a put
+    on the full queue would never return."""
+    try:
+        async for item in items:
+            await queue.put(item)
+    except asyncio.CancelledError:
+        raise
+    except BaseException:
+        await queue.put(None)
+        raise
+    await queue.put(None)
+
+def upstream_client(**kwargs) -> httpx.AsyncClient:
+    """Creates the httpx client of one tool call (certificate verification is off, as appliances commonly use
+    self-signed certificates). Its request hook feeds the per-phase timers while a profile capture is running."""
+    return httpx.AsyncClient(verify=False, event_hooks={"request": [trace_request]}, **kwargs)
+
+def response_json(response: httpx.Response):
+    """Decodes a JSON response body with the fastest available parser.
+    httpx advertises and transparently decodes gzip/deflate (and br when brotli is installed) via Accept-Encoding,
+    so num_bytes_downloaded is the size on the wire, which is logged at debug level with the decoded size."""
+    content = response.content
+    if logger.isEnabledFor(logging.DEBUG):
+        encoding = response.headers.get("content-encoding", "identity")
+        logger.debug(f"{response.url.path} response: {response.num_bytes_downloaded:,} bytes on wire ({encoding}), {len(content):,} decoded")
+    with phase("decode"):
+        return json_loads(content)
+
+def sdk_url(params: dict) -> str:
+    """Builds a Concentrator/Broker SDK REST URL from query parameters."""
+    param_str = "&".join([f"{k}={quote_plus(str(v))}" for k, v in params.items()])
+    return f"{API_URL}/sdk?{param_str}"
+
+def session_page_params(query_str: str, size: int, id1: int | None = None) -> dict:
+    """SDK msg=query parameters for one page of sessions."""
+    params = {
+        'msg': 'query',
+        'force-content-type': 'application/json',
+        'size': size,
+        'query': query_str
+    }
+    if id1 is not None:
+        params['id1'] = id1
+    return params
+
+async def fetch_session_page(client: httpx.AsyncClient, query_str: str, size: int, id1: int | None = None) -> tuple[list, int | None]:
+    """Runs one SDK msg=query page. Returns the meta fields and the last meta id (id2) covered by the page."""
+    response = await client.get(sdk_url(session_page_params(query_str, size, id1)), timeout=request_timeout())
+    response.raise_for_status()
+    results = response_json(response).get('results', {})
+    return results.get('fields', []), results.get('id2')
+
+async def iter_metakey_values(client: httpx.AsyncClient, meta_key: str, where_filter: str, stats: dict | None = None):
+    """Pages through the complete msg=values result for a meta key, yielding lists of (value, session count).
+    Values are requested in ascending value order and each page continues after the last value of the previous one.
+    Stops after NW_VALUES_MAX_PAGES pages, or early when the call's deadline is reached; `stats` (if given) receives
+    the page count, a truncated flag and a deadline flag."""
+    stats = stats if stats is not None else {}
+    stats.update(pages=0, truncated=False, deadline=False)
+    last_value = None
+    while True:
+        if stats["pages"] >= NW_VALUES_MAX_PAGES:
+            stats["truncated"] = True
+            logger.warning(f"Stopped paging '{meta_key}' values after {NW_VALUES_MAX_PAGES} pages.")
+            return
+
+        page_filter = where_filter
+        if last_value is not None:
+            page_filter = f"{where_filter} && {meta_key} > {meta_value_literal(meta_key, last_value)}"
+        params = {
+            'msg': 'values',
+            'force-content-type': 'application/json',
+            'size': NW_VALUES_PAGE_SIZE,
+            'fieldName': meta_key,
+            'flags': 'sessions,sort-value,order-ascending',
+            'where': page_filter
+        }
+        try:
+            response = await client.get(sdk_url(params), timeout=request_timeout())
+        except (DeadlineExceeded, httpx.TimeoutException):
+            # Keep the pages already read when the deadline runs out; fail only if there are none
+            if not stats["pages"] or not deadline_expired():
+                raise
+            stats.update(truncated=True, deadline=True)
+            logger.warning(f"Stopped paging '{meta_key}' values at the deadline after {stats['pages']} pages.")
+            return
+        response.raise_for_status()
+        fields = response_json(response).get('results', {}).get('fields', [])
+        stats["pages"] += 1
+
+        page = [(item.get('value'), item.get('count', 0)) for item in fields]
+        if page:
+            yield page
+        if len(page) < NW_VALUES_PAGE_SIZE or page[-1][0] == last_value:
+            return
+        last_value = page[-1][0]
+
+def sessions_from_fields(fields: list) -> list[dict]:
+    """Groups SDK meta fields into session records ({'sessionid': group, meta_key: value | [values]}), preserving order."""
+    sessions = []
+    current = None
+    for item in fields:
+        group_id = item.get('group')
+        if current is None or current['sessionid'] != group_id:
+            current = {'sessionid': group_id}
+            sessions.append(current)
+        field_type = item.get('type', 'N/A')
+        field_value = item.get('value')
+        if field_type not in current:
+            current[field_type] = field_value
+        elif isinstance(current[field_type], list):
+            current[field_type].append(field_value)
+        else:
+            current[field_type] = [current[field_type], field_value]
+    return sessions
+
+async def iter_sessions(client: httpx.AsyncClient, query_str: str, page_size: int, id1: int | None = None, pending: dict | None = None):
+    """Pages through all results of an SDK query by meta id.
+    Yields (sessions, next_id1, pending) per page: the last session of a page is held back as `pending` because its meta
+    may continue on the next page. Passing next_id1 and pending back in resumes the stream exactly where it stopped.
+    Raises DeadlineExceeded when the call's deadline is reached after the first page; the pages yielded so far stand."""
+    first_page = True
+    while True:
+        try:
+            fields, id2 = await fetch_session_page(client, query_str, page_size, id1)
+        except httpx.TimeoutException as e:
+            if first_page or not deadline_expired():
+                raise
+            raise DeadlineExceeded(f"the deadline of this call was reached while reading page at meta id {id1}") from e
+        first_page = False
+        sessions = sessions_from_fields(fields)
+        if pending and sessions and sessions[0]['sessionid'] == pending['sessionid']:
+            for key, value in sessions.pop(0).items():
+                if key == 'sessionid':
+                    continue
+                if key not in pending:
+                    pending[key] = value
+                else:
+                    existing = pending[key] if isinstance(pending[key], list) else [pending[key]]
+                    pending[key] = existing + (value if isinstance(value, list) else [value])
+        if pending:
+            sessions.insert(0, pending)
+
+        last_page = len(fields) < page_size or id2 is None or (id1 is not None and id2 < id1)
+        if last_page:
+            yield sessions, None, None
+            return
+
+        pending = sessions.pop() if sessions else None
+        id1 = id2 + 1
+        yield sessions, id1, pending
+
+class ResultCache:
+    """A small LRU cache whose entries expire after ttl seconds. Stores (value, created_at) per key."""
+
+    def __init__(self, ttl: float, max_entries: int = 256):
+        from collections import OrderedDict
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """Returns (value, created_at) if the key is cached and fresh, else None."""
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry[1] > self.ttl:
+            self.entries.pop(key, None)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, value) -> None:
+        self.entries[key] = (value, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+_profile_cache = ResultCache(NW_PROFILE_CACHE_SECONDS)
+
+# Standing queries: results refreshed in the background and served to matching interactive calls
+_standing_cache = ResultCache(NW_PREFETCH_MAX_AGE_SECONDS)
+# Tool name -> (undecorated tool coroutine, prefetchable), registered by @tool_call
+_tool_functions: dict = {}
+_interactive_calls = {"active": 0}
+# Profile capture armed by capture_tool_profiles, and the event loop lag monitor started with the server
+_profiling = {"capture": None, "lag_monitor": None}
+
+def tool_call_key(func, args: tuple, kwargs: dict) -> tuple:
+    """Identifies a tool call by its name and all argument values (defaults applied), ignoring deadline_seconds."""
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return (func.__name__, tuple(sorted((k, v) for k, v in bound.arguments.items() if k != "deadline_seconds")))
+
+def tool_call(prefetchable: bool = False):
+    """Decorates a tool coroutine (below @mcp.tool): counts it as an interactive call, which background prefetching
+    yields to, profiles it while a capture is armed, and for prefetchable tools serves a call matching a standing
+    query from the prefetched result."""
+    def decorator(func):
+        _tool_functions[func.__name__] = (func, prefetchable)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if prefetchable and _standing_cache.entries:
+                entry = _standing_cache.get(tool_call_key(func, args, kwargs))
+                if entry:
+                    result, refreshed_at = entry
+                    refreshed = datetime.fromtimestamp(refreshed_at, tz=timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+                    logger.info(f"Serving {func.__name__} from the standing query cache (refreshed {refreshed}).")
+                    return f"*Standing query result, refreshed at {refreshed} ({int(time.time() - refreshed_at)}s ago).*\n\n{result}"
+            _interactive_calls["active"] += 1
+            try:
+                capture = _profiling["capture"]
+                if capture is not None and capture.claim(func.__name__):
+                    return await capture.run(func.__name__, func, args, kwargs)
+                return await func(*args, **kwargs)
+            finally:
+                _interactive_calls["active"] -= 1
+        return wrapper
+    return decorator
+
+def load_standing_queries() -> list[dict]:
+    """Reads the NW_STANDING_QUERIES JSON file: a list of {"tool": ..., "args": {...}, "interval_seconds": ...}.
+    Entries for unknown or non-prefetchable tools, or with invalid arguments, are skipped with a warning."""
+    with open(NW_STANDING_QUERIES, encoding="utf-8") as standing_file:
+        entries = json.load(standing_file)
+
+    queries = []
+    for entry in entries:
+        name = entry.get("tool")
+        args = entry.get("args", {})
+        func, prefetchable = _tool_functions.get(name, (None, False))
+        if not prefetchable:
+            logger.warning(f"Standing query skipped: '{name}' is not a prefetchable tool.")
+            continue
+        try:
+            key = tool_call_key(func, (), args)
+        except TypeError as e:
+            logger.warning(f"Standing query skipped: invalid arguments for {name}: {e}")
+            continue
+        queries.append({"tool": name, "func": func, "args": args, "key": key,
+                        "interval": entry.get("interval_seconds", NW_PREFETCH_INTERVAL_SECONDS)})
+    return queries
+
+async def refresh_standing_query(query: dict, slot: asyncio.Semaphore) -> None:
+    """Re-runs one standing query in the low-priority slot and stores a successful result in the standing cache."""
+    async with slot:
+        # Only start while no interactive call is running, so prefetching never competes with one
+        while _interactive_calls["active"]:
+            await asyncio.sleep(1)
+        started = time.monotonic()
+        result = await query["func"](**query["args"])
+    if result.startswith("❌"):
+        logger.warning(f"Standing query {query['tool']} failed: {result.splitlines()[0]}")
+        return
+    _standing_cache.put(query["key"], result)
+    logger.info(f"Refreshed standing query {query['tool']} {query['args']} in {time.monotonic() - started:.1f}s.")
+
+async def run_prefetcher(queries: list[dict]) -> None:
+    """Refreshes every standing query on its own interval, with jittered start and interval times."""
+    import random
+
+    slot = asyncio.Semaphore(NW_PREFETCH_CONCURRENCY)
+
+    async def schedule(query: dict):
+        # A random start offset staggers the queries instead of hitting the Concentrator with all of them at once
+        await asyncio.sleep(random.uniform(0, NW_PREFETCH_STAGGER_SECONDS))
+        while True:
+            try:
+                await refresh_standing_query(query, slot)
+            except Exception as e:
+                logger.error(f"Standing query {query['tool']} failed: {e}", exc_info=True)
+            await asyncio.sleep(query["interval"] * random.uniform(0.9, 1.1))
+
+    await asyncio.gather(*(schedule(query) for query in queries))
+
+def start_loop_lag_monitor() -> asyncio.Task | None:
+    """Starts the event loop lag monitor unless NW_LOOP_LAG_INTERVAL_MS is 0."""
+    if NW_LOOP_LAG_INTERVAL_MS <= 0:
+        return None
+    from profiling import LoopLagMonitor
+    monitor = _profiling["lag_monitor"] = LoopLagMonitor(NW_LOOP_LAG_INTERVAL_MS / 1000, NW_LOOP_LAG_WARN_MS / 1000)
+    return asyncio.create_task(monitor.run())
+
+def start_prefetcher() -> asyncio.Task | None:
+    """Starts the background prefetcher task if NW_STANDING_QUERIES lists any valid standing queries."""
+    if not NW_STANDING_QUERIES.strip():
+        return None
+    try:
+        queries = load_standing_queries()
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to load standing queries from {NW_STANDING_QUERIES}: {e}")
+        return None
+    if not queries:
+        return None
+    logger.info(f"Prefetching {len(queries)} standing queries from {NW_STANDING_QUERIES}.")
+    return asyncio.create_task(run_prefetcher(queries))
+
+_ioc_state = {"index": None, "checked": 0.0, "lock": asyncio.Lock()}
+
+async def get_ioc_index():
+    """Returns the offline IOC index for NW_IOC_FEED_DIR, or None if enrichment is not configured.
+    The feeds are checked for changes at most every NW_IOC_RELOAD_SECONDS; unchanged feeds are simply re-mapped."""
+    if not NW_IOC_FEED_DIR.strip():
+        return None
+
+    checked = _ioc_state["checked"]
+    if _ioc_state["index"] is None or time.monotonic() - checked >= NW_IOC_RELOAD_SECONDS:
+        # One load at a time: concurrent calls wait for it instead of compiling the same feeds again
+        async with _ioc_state["lock"]:
+            if _ioc_state["checked"] == checked:
+                _ioc_state["checked"] = time.monotonic()
+                from ioc_index import IOCIndex
+                try:
+                    # Compiling millions of indicators takes seconds, keep it off the event loop
+                    index = await asyncio.to_thread(IOCIndex.load, NW_IOC_FEED_DIR, NW_IOC_INDEX_PATH)
+                    if _ioc_state["index"] is None or index.fingerprint != _ioc_state["index"].fingerprint:
+                        logger.info(f"IOC index loaded: {index.stats}")
+                    _ioc_state["index"] = index
+                except Exception as e:
+                    logger.error(f"Failed to load IOC feeds from {NW_IOC_FEED_DIR}: {e}", exc_info=True)
+
+    return _ioc_state["index"]
+
+def ioc_annotation(ioc_index, value) -> str:
+    """Returns a markdown suffix naming the IOC feeds that match value, or an empty string."""
+    if ioc_index is None or not isinstance(value, str) or not value:
+        return ""
+    feeds = ioc_index.match(value)
+    return f" ⚠️ **IOC**: {feeds}" if feeds else ""
+
+def format_session_fields(results: list, ioc_index) -> tuple[list[str], int]:
+    """Formats SDK query meta fields as markdown lines grouped by session. Returns the lines and the number of IOC matches."""
+    ioc_matches = 0
+    lines = []
+    current_group = None
+    
+    for item in results:
+        field_type = item.get('type', 'N/A')
+        field_value = item.get('value', 'N/A')
+        group_id = item.get('group', 'N/A')
+
+        if group_id != current_group:
+            if current_group is not None:
+                lines.append("---")
+            lines.append(f"**Session ID**: {group_id}")
+            current_group = group_id
+        
+        annotation = ioc_annotation(ioc_index, field_value) if field_type in IOC_ENRICHED_KEYS else ""
+        ioc_matches += bool(annotation)
+        lines.append(f"- **{field_type}**: {field_value}{annotation}")
+
+    return lines, ioc_matches
+
+async def count_sessions(client: httpx.AsyncClient, where_filter: str) -> int:
+    """Counts the sessions matching a filter with one cheap msg=values call over 'medium', which every session has exactly once."""
+    params = {
+        'msg': 'values',
+        'force-content-type': 'application/json',
+        'size': 100,
+        'fieldName': 'medium',
+        'flags': 'sessions,sort-total,order-descending',
+        'where': where_filter
+    }
+    response = await client.get(sdk_url(params), timeout=request_timeout())
+    response.raise_for_status()
+    return sum(item.get('count', 0) for item in response_json(response).get('results', {}).get('fields', []))
+
+async def narrow_query_sessions(client: httpx.AsyncClient, where_clause: str, select_clause: str, time_range: str,
+                                max_results: int, saturated_results: list) -> str:
+    """Handles a query_sessions result that hit max_results: bisects the time range with concurrent session counts until
+    every sub-window fits in one query (at most NW_NARROW_MAX_WINDOWS sub-windows), then returns either the complete results
+    per sub-window or, if the budget is exceeded, the accurate total and the densest sub-windows."""
+    start_dt, end_dt = calculate_time_window(time_range)
+    semaphore = asyncio.Semaphore(NW_NARROW_CONCURRENCY)
+
+    def window_filter(window_start, window_end):
+        return combine_where(where_clause, absolute_time_filter(window_start, window_end))
+
+    async def count(window_start, window_end):
+        async with semaphore:
+            return await count_sessions(client, window_filter(window_start, window_end))
+
+    # Sessions that fit in one query, from the meta fields per session seen in the saturated page
+    sessions_seen = len({item.get('group') for item in saturated_results}) or 1
+    capacity = max(1, int(max_results / (len(saturated_results) / sessions_seen)) - 1)
+
+    windows = [(start_dt, end_dt, await count(start_dt, end_dt))]
+    total = windows[0][2]
+    count_queries = 1
+    while not deadline_expired():
+        oversized = sorted((w for w in windows if w[2] > capacity and w[1] > w[0]), key=lambda w: w[2], reverse=True)
+        oversized = oversized[:NW_NARROW_MAX_WINDOWS - len(windows)]
+        if not oversized:
+            break
+        # Counts are additive over a partition, so only the left half of each split needs a query
+        halves = [(w, w[0] + (w[1] - w[0]) / 2) for w in oversized]
+        halves = [(w, middle.replace(microsecond=0)) for w, middle in halves]
+        try:
+            left_counts = await gather_or_cancel(*(count(w[0], middle) for w, middle in halves))
+        except (DeadlineExceeded, httpx.TimeoutException):
+            # Report the sub-windows counted so far
+            if not deadline_expired():
+                raise
+            break
+        count_queries += len(halves)
+        for (window, middle), left_count in zip(halves, left_counts):
+            windows.remove(window)
+            windows.append((window[0], middle, left_count))
+            windows.append((middle + timedelta(seconds=1), window[1], window[2] - left_count))
+    windows.sort(key=lambda w: w[0])
+
+    def window_label(window):
+        return f"{window[0].strftime('%Y-%m-%d %H:%M:%S')} - {window[1].strftime('%H:%M:%S')} UTC"
+
+    formatted_output = f"**NetWitness Query Results** (Last {time_range}, auto-narrowed)\n\n"
+    if where_clause.strip():
+        formatted_output += f"*Filter: {where_clause}*\n\n"
+
+    if all(w[2] <= capacity for w in windows):
+        select_part = f"select {select_clause.strip() or '*'}"
+
+        async def fetch(window):
+            async with semaphore:
+                try:
+                    fields, _ = await fetch_session_page(client, f"{select_part} where {window_filter(window[0], window[1])}", max_results)
+                except (DeadlineExceeded, httpx.TimeoutException):
+                    if not deadline_expired():
+                        raise
+                    return None
+                return fields
+
+        # The capacity is only an estimate: later sessions can carry more meta fields than those of the saturated page.
+        # A sub-window whose page still hits max_results is split again while the window budget allows.
+        fetched = {}
+        pending = [w for w in windows if w[2]]
+        session_queries = 1
+        while pending:
+            pages = await gather_or_cancel(*(fetch(w) for w in pending))
+            session_queries += len(pending)
+            fetched.update(zip(pending, pages))
+            saturated = [w for w, fields in zip(pending, pages) if fields is not None and len(fields) >= max_results and w[1] > w[0]]
+            saturated = saturated[:max(0, NW_NARROW_MAX_WINDOWS - len(windows))]
+            pending = []
+            if not saturated or deadline_expired():
+                break
+            halves = [(w, (w[0] + (w[1] - w[0]) / 2).replace(microsecond=0)) for w in saturated]
+            try:
+                left_counts = await gather_or_cancel(*(count(w[0], middle) for w, middle in halves))
+            except (DeadlineExceeded, httpx.TimeoutException):
+                if not deadline_expired():
+                    raise
+                break
+            count_queries += len(halves)
+            for (window, middle), left_count in zip(halves, left_counts):
+                windows.remove(window)
+                del fetched[window]
+                for half in ((window[0], middle, left_count), (middle + timedelta(seconds=1), window[1], window[2] - left_count)):
+                    windows.append(half)
+                    if half[2]:
+                        pending.append(half)
+        windows.sort(key=lambda w: w[0])
+
+        non_empty = [w for w in windows if w[2]]
+        ioc_index = await get_ioc_index()
+        ioc_matches = 0
+        returned = missing = truncated = 0
+        sections = []
+        for window in non_empty:
+            fields = fetched[window]
+            if fields is None:
+                missing += 1
+                sections.append(f"### {window_label(window)} ({window[2]:,} sessions)\n*Not fetched: the deadline of this call was reached.*")
+                continue
+            lines, matches = format_session_fields(fields, ioc_index)
+            ioc_matches += matches
+            returned += len({item.get('group') for item in fields})
+            if len(fields) >= max_results:
+                truncated += 1
+                sections.append(f"### {window_label(window)} ({window[2]:,} sessions, truncated at max_results)\n" + "\n".join(lines))
+            else:
+                sections.append(f"### {window_label(window)} ({window[2]:,} sessions)\n" + "\n".join(lines))
+
+        if missing or truncated:
+            gaps = []
+            if truncated:
+                gaps.append(f"{truncated} of them still truncated at max_results")
+            if missing:
+                gaps.append(f"{missing} of them not fetched before the deadline")
+            formatted_output += f"*Results exceeded max_results ({max_results}); split into {len(non_empty)} sub-windows, "
+            formatted_output += f"{' and '.join(gaps)} (partial results).*\n\n"
+        else:
+            formatted_output += f"*Results exceeded max_results ({max_results}); returned complete in {len(non_empty)} sub-windows "
+            formatted_output += f"({count_queries} count queries, {session_queries} session queries).*\n\n"
+        formatted_output += "\n\n".join(sections)
+        if missing or truncated:
+            formatted_output += f"\n\n**Sessions Returned**: {returned:,} of {total:,} matching"
+        else:
+            formatted_output += f"\n\n**Total Sessions**: {total:,}"
+        if ioc_index is not None:
+            formatted_output += f"\n**IOC Matches**: {ioc_matches}"
+        return formatted_output.strip()
+
+    densest = sorted(windows, key=lambda w: w[2], reverse=True)[:5]
+    formatted_output += f"⚠️ **Total Matching Sessions**: {total:,}, too many to return (about {capacity:,} fit in max_results={max_results}).\n\n"
+    formatted_output += "**Densest sub-windows**:\n\n| Window | Sessions | Sessions/min |\n|-------|-------|-------|\n"
+    for window in densest:
+        minutes = max((window[1] - window[0]).total_seconds() + 1, 1) / 60
+        formatted_output += f"| {window_label(window)} | {window[2]:,} | {window[2] / minutes:,.1f} |\n"
+    formatted_output += (
+        f"\n*{count_queries} count queries over {len(windows)} sub-windows{' (stopped at the deadline)' if deadline_expired() else ''}.* Narrow the where_clause, or drill into a window by adding "
+        f'time="YYYY-Mon-DD HH:MM:SS"-"YYYY-Mon-DD HH:MM:SS" to the where_clause (UTC), or use export_sessions for the full set.'
+    )
+    return formatted_output.strip()
+
+async def summarize_sessions(client: httpx.AsyncClient, query_str: str, max_sessions: int):
+    """Streams up to max_sessions sessions of an SDK query once into a SessionSummary. Returns the summary and why
+    the stream stopped early ('limit', 'deadline' or None)."""
+    from session_summary import SessionSummary
+
+    summary = SessionSummary(sample_size=NW_SUMMARY_SAMPLE_SIZE)
+    stopped = None
+    try:
+        async for sessions, next_id1, pending in iter_sessions(client, query_str, NW_EXPORT_PAGE_SIZE):
+            for session in sessions:
+                if summary.sessions >= max_sessions:
+                    stopped = "limit"
+                    break
+                summary.add(session, session_epoch(session.get('time')))
+            if stopped or (summary.sessions >= max_sessions and (next_id1 is not None or pending)):
+                stopped = "limit"
+                break
+    except DeadlineExceeded:
+        stopped = "deadline"
+    return summary, stopped
+
 # === RESOURCES ===
 @mcp.resource("netwitness://meta-keys")
 def get_meta_keys() -> str:
@@ -625,20 +1318,30 @@ async def get_netwitness_query_syntax() -> str:
 
 # === MCP TOOLS ===
 @mcp.tool(annotations={"readOnlyHint": True,"sensitiveHint": "High"})
+@tool_call(prefetchable=True)
 async def query_sessions(
     where_clause: str = "", 
     select_clause: str = "",
     time_range: str = "1h",
-    max_results: int = 1000
+    max_results: int = 1000,
+    auto_narrow: bool = False,
+    output_mode: str = "sessions",
+    max_output_chars: int = 0,
+    deadline_seconds: float = 0
 ) -> str:
-    """Queries NetWitness sessions using SQL-like WHERE clause syntax. IMPORTANT: Check resources netwitness://meta-keys for available fields and netwitness://query-syntax for syntax examples before building queries. Time range examples: 30m, 1h, 24h. Returns detailed session records."""
+    """Queries NetWitness sessions using SQL-like WHERE clause syntax. IMPORTANT: Check resources netwitness://meta-keys for available fields and netwitness://query-syntax for syntax examples before building queries. Time range examples: 30m, 1h, 24h. Returns detailed session records. Set auto_narrow=True to avoid silent truncation: if the results hit max_results, the time range is split into sub-windows using cheap session counts, and either the complete results per sub-window or the accurate total with the densest sub-windows are returned. Set output_mode='summary' for large result sets: up to max_results sessions are streamed once and summarized (per meta key coverage, distinct counts and top values, size/payload ranges, time span and a few sample sessions) within max_output_chars characters (default NW_SUMMARY_MAX_CHARS), instead of listing every session. deadline_seconds (optional) caps the total time of the call."""
 
-    logger.info(f"Executing query_sessions: select='{select_clause}', where='{where_clause}', time={time_range}, limit={max_results}")
+    logger.info(f"Executing query_sessions: select='{select_clause}', where='{where_clause}', time={time_range}, limit={max_results}, auto_narrow={auto_narrow}, mode={output_mode}")
+    start_deadline(deadline_seconds)
 
     if not API_URL.strip():
         return "❌ Error: NETWITNESS_API_URL is not configured."
     if not API_USERNAME.strip() or not API_PASSWORD.strip():
         return "❌ Error: NETWITNESS_USERNAME or NETWITNESS_PASSWORD are not configured."
+    if output_mode not in ("sessions", "summary"):
+        return f"❌ Error: output_mode must be 'sessions' or 'summary', got '{output_mode}'"
+    if 0 < max_output_chars < 500:
+        return f"❌ Error: max_output_chars must be at least 500 (or 0 for the NW_SUMMARY_MAX_CHARS default), got {max_output_chars}"
 
     # Build query string
     if not select_clause.strip():
@@ -658,45 +1361,75 @@ async def query_sessions(
     url = f"{API_URL}/sdk?msg=query&force-content-type=application/json&size={max_results}&query={encoded_query}"
 
     try:
-        async with httpx.AsyncClient(auth=(API_USERNAME, API_PASSWORD), verify=False) as client:
-            response = await client.get(url, timeout=30)
+        async with upstream_client(auth=(API_USERNAME, API_PASSWORD)) as client:
+            if output_mode == "summary":
+                # The header, notices included, counts against the output size budget
+                budget = max_output_chars if max_output_chars > 0 else NW_SUMMARY_MAX_CHARS
+                header = f"**NetWitness Query Summary** (Last {time_range})\n\n"
+                if where_clause.strip():
+                    # A long filter is echoed shortened, so it takes at most a quarter of the budget
+                    shown_filter = where_clause if len(where_clause) <= budget // 4 else where_clause[:budget // 4 - 1] + "…"
+                    header += f"*Filter: {shown_filter}*\n\n"
+                summary, stopped = await summarize_sessions(client, query_str, max_results)
+                if not summary.sessions:
+                    return f"No results found for the given query in the last {time_range}."
+                if stopped == "limit":
+                    header += f"*Summary of the first {summary.sessions:,} matching sessions (max_results); more sessions match.*\n\n"
+                elif stopped == "deadline":
+                    header += f"*Warning: the deadline of this call was reached after {summary.sessions:,} sessions; the summary is partial.*\n\n"
+
+                ioc_index = await get_ioc_index()
+
+                def annotate(meta_key, value):
+                    return ioc_annotation(ioc_index, value) if meta_key in IOC_ENRICHED_KEYS else ""
+
+                with phase("format"):
+                    rendered = summary.render(max(0, budget - len(header)), annotate)
+                return (header + rendered).strip()
+
+            response = await client.get(url, timeout=request_timeout())
             response.raise_for_status()
-            data = response.json()
+            data = response_json(response)
 
             results = data.get('results', {}).get('fields', [])
             
             if not results:
                 return f"No results found for the given query in the last {time_range}."
+
+            narrowing_stopped = False
+            if auto_narrow and len(results) >= max_results:
+                try:
+                    return await narrow_query_sessions(client, where_clause, select_clause, time_range, max_results, results)
+                except (DeadlineExceeded, httpx.TimeoutException):
+                    # Fall back to the truncated first page
+                    if not deadline_expired():
+                        raise
+                    narrowing_stopped = True
             
             formatted_output = f"**NetWitness Query Results** (Last {time_range})\n\n"
             
             if where_clause.strip():
                 formatted_output += f"*Filter: {where_clause}*\n\n"
+            if narrowing_stopped:
+                formatted_output += f"*Warning: auto-narrowing stopped at the deadline; only the first {max_results} results are shown.*\n\n"
             
-            lines = []
-            current_group = None
-            
-            for item in results:
-                field_type = item.get('type', 'N/A')
-                field_value = item.get('value', 'N/A')
-                group_id = item.get('group', 'N/A')
-
-                if group_id != current_group:
-                    if current_group is not None:
-                        lines.append("---")
-                    lines.append(f"**Session ID**: {group_id}")
-                    current_group = group_id
-                
-                lines.append(f"- **{field_type}**: {field_value}")
+            ioc_index = await get_ioc_index()
+            with phase("format"):
+                lines, ioc_matches = format_session_fields(results, ioc_index)
             
             formatted_output += "\n".join(lines)
             formatted_output += f"\n\n**Total Sessions**: {len(set(item.get('group') for item in results if item.get('group')))}"
+            if ioc_index is not None:
+                formatted_output += f"\n**IOC Matches**: {ioc_matches}"
             
             return formatted_output.strip()
     
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP error during NetWitness query: {e.response.status_code} - {e.response.text}")
         return f"❌ NetWitness API Error: {e.response.status_code} - {e.response.text}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness query: {e!r}")
+        return deadline_error(e)
     except httpx.RequestError as e:
         logger.error(f"Request error during NetWitness query: {e}")
         return f"❌ Request Error: Unable to connect to NetWitness API. {str(e)}"
@@ -706,16 +1439,19 @@ async def query_sessions(
 
 
 @mcp.tool(annotations={"readOnlyHint": True,"sensitiveHint": "High"})
+@tool_call(prefetchable=True)
 async def query_metakey_values(
     meta_key: str,
     where_clause: str = "",
     time_range: str = "1h",
     limit: int = 100,
-    sort_order: str = "descending"
+    sort_order: str = "descending",
+    deadline_seconds: float = 0
 ) -> str:
-    """Gets aggregated values for a specific NetWitness meta key with counts (top-N query). Use where_clause to filter results (e.g., 'service=443' to see IPs only on HTTPS). Check resources netwitness://meta-keys for available fields and netwitness://query-syntax for syntax examples before building queries to be used in the where_clause. Time range examples: 30m, 1h, 24h. sort_order can be 'descending' (default, most common first) or 'ascending' (least common first). Returns top values by frequency with occurrence counts."""
+    """Gets aggregated values for a specific NetWitness meta key with counts (top-N query). Use where_clause to filter results (e.g., 'service=443' to see IPs only on HTTPS). Check resources netwitness://meta-keys for available fields and netwitness://query-syntax for syntax examples before building queries to be used in the where_clause. Time range examples: 30m, 1h, 24h. sort_order can be 'descending' (default, most common first) or 'ascending' (least common first). Returns top values by frequency with occurrence counts. deadline_seconds (optional) caps the total time of the call."""
     
     logger.info(f"Executing query_metakey_values: meta_key='{meta_key}', where='{where_clause}', time={time_range}, limit={limit}, sort={sort_order}")
+    start_deadline(deadline_seconds)
 
     if not API_URL.strip():
         return "❌ Error: NETWITNESS_API_URL is not configured."
@@ -752,10 +1488,10 @@ async def query_metakey_values(
     url = f"{API_URL}/sdk?{param_str}"
     
     try:
-        async with httpx.AsyncClient(auth=(API_USERNAME, API_PASSWORD), verify=False) as client:
-            response = await client.get(url, timeout=30)
+        async with upstream_client(auth=(API_USERNAME, API_PASSWORD)) as client:
+            response = await client.get(url, timeout=request_timeout())
             response.raise_for_status()
-            data = response.json()
+            data = response_json(response)
             
             # Parse the values response
             results = data.get('results', {}).get('fields', [])
@@ -769,23 +1505,40 @@ async def query_metakey_values(
             if where_clause.strip():
                 formatted_output += f"*Filter: {where_clause}*\n\n"
             
-            formatted_output += "| Value | Count |\n"
-            formatted_output += "|-------|-------|\n"
+            ioc_index = await get_ioc_index() if meta_key in IOC_ENRICHED_KEYS else None
+            ioc_matches = 0
+
+            if ioc_index is not None:
+                formatted_output += "| Value | Count | IOC |\n"
+                formatted_output += "|-------|-------|-----|\n"
+            else:
+                formatted_output += "| Value | Count |\n"
+                formatted_output += "|-------|-------|\n"
             
             for item in results:
                 value = item.get('value', 'N/A')
                 count = item.get('count', 0)
-                formatted_output += f"| {value} | {count:,} |\n"
+                if ioc_index is not None:
+                    feeds = ioc_index.match(value) if isinstance(value, str) and value else None
+                    ioc_matches += bool(feeds)
+                    formatted_output += f"| {value} | {count:,} | {'⚠️ ' + feeds if feeds else ''} |\n"
+                else:
+                    formatted_output += f"| {value} | {count:,} |\n"
             
             total_count = sum(item.get('count', 0) for item in results)
             formatted_output += f"\n**Total Events**: {total_count:,}"
             formatted_output += f"\n**Unique Values Shown**: {len(results)}"
+            if ioc_index is not None:
+                formatted_output += f"\n**IOC Matches**: {ioc_matches}"
             
             return formatted_output.strip()
     
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP error during NetWitness values query: {e.response.status_code} - {e.response.text}")
         return f"❌ NetWitness API Error: {e.response.status_code} - {e.response.text}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness values query: {e!r}")
+        return deadline_error(e)
     except httpx.RequestError as e:
         logger.error(f"Request error during NetWitness values query: {e}")
         return f"❌ Request Error: Unable to connect to NetWitness API. {str(e)}"
@@ -794,8 +1547,265 @@ async def query_metakey_values(
         return f"❌ An unexpected error occurred: {str(e)}"
 
 
+@mcp.tool(annotations={"readOnlyHint": False,"sensitiveHint": "High"})
+@tool_call()
+async def export_sessions(
+    where_clause: str = "",
+    select_clause: str = "",
+    time_range: str = "1h",
+    output_format: str = "ndjson",
+    export_name: str = "",
+    resume: bool = True,
+    deadline_seconds: float = 0
+) -> str:
+    """Exports ALL sessions matching a WHERE clause to a compressed file on the server instead of returning them (use for case exports of thousands to millions of sessions). output_format is 'ndjson' (default, one JSON object per session) or 'csv' (requires an explicit select_clause, which defines the columns). An interrupted export is resumed when called again with the same arguments (resume=False starts over); calling again after an export completed starts a new export of the current time window, replacing the file. Returns only the file path, time window, session count and size in bytes. deadline_seconds (optional, default NW_STREAM_DEADLINE_SECONDS) caps the time of one call; an export stopped by it is resumed by calling again."""
+
+    logger.info(f"Executing export_sessions: select='{select_clause}', where='{where_clause}', time={time_range}, format={output_format}, name='{export_name}'")
+    start_deadline(deadline_seconds, NW_STREAM_DEADLINE_SECONDS)
+
+    if not API_URL.strip():
+        return "❌ Error: NETWITNESS_API_URL is not configured."
+    if not API_USERNAME.strip() or not API_PASSWORD.strip():
+        return "❌ Error: NETWITNESS_USERNAME or NETWITNESS_PASSWORD are not configured."
+
+    from session_export import FORMATS, SessionExportWriter
+
+    output_format = output_format.lower()
+    if output_format not in FORMATS:
+        return f"❌ Error: output_format must be one of {', '.join(FORMATS)}, got '{output_format}'"
+
+    select_fields = [field.strip() for field in select_clause.split(",") if field.strip()]
+    if output_format == "csv" and (not select_fields or "*" in select_fields):
+        return "❌ Error: CSV export requires an explicit select_clause (e.g. 'ip.src,ip.dst,service'), which defines the columns."
+
+    query = {"where": where_clause.strip(), "select": ",".join(select_fields) or "*", "time_range": time_range, "format": output_format}
+    name = "".join(c if c.isalnum() or c in "-_." else "_" for c in export_name.strip())
+    if not name:
+        import hashlib
+        name = "sessions-" + hashlib.sha256(json.dumps(query, sort_keys=True).encode()).hexdigest()[:12]
+    path = os.path.join(NW_EXPORT_DIR, name + FORMATS[output_format])
+
+    writer = SessionExportWriter(path, query, ["sessionid"] + select_fields if output_format == "csv" else None)
+    # Only an interrupted export is resumed; once complete, calling again exports the current time window afresh
+    resuming = resume and writer.load_checkpoint() and not writer.state["complete"]
+    if not resuming:
+        writer.reset()
+        # The time window is fixed when the export starts so a resumed export reads the same sessions
+        writer.state["time_filter"] = absolute_time_filter(*calculate_time_window(time_range))
+
+    time_filter = writer.state["time_filter"]
+    where_part = f"where {query['where']} && {time_filter}" if query['where'] else f"where {time_filter}"
+    query_str = f"select {query['select']} {where_part}"
+
+    os.makedirs(NW_EXPORT_DIR, exist_ok=True)
+
+    # Producer/consumer with a small bounded queue: fetching pauses while the writer falls behind,
+    # so at most a few pages are ever held in memory
+    pages: asyncio.Queue = asyncio.Queue(maxsize=2)
+
+    async def produce(client: httpx.AsyncClient):
+        await feed_queue(pages, iter_sessions(client, query_str, NW_EXPORT_PAGE_SIZE, writer.state["id1"], writer.state["pending"]))
+
+    async def consume():
+        while (page := await pages.get()) is not None:
+            await asyncio.to_thread(writer.write_batch, *page)
+
+    try:
+        async with upstream_client(auth=(API_USERNAME, API_PASSWORD)) as client:
+            producer = asyncio.create_task(produce(client))
+            try:
+                await consume()
+            finally:
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+            if not producer.cancelled():
+                producer.result()
+
+        return (
+            f"**Export Complete**{' (resumed)' if resuming else ''}\n"
+            f"- **Path**: {path}\n"
+            f"- **Time Window**: `{time_filter}`\n"
+            f"- **Sessions**: {writer.state['rows']:,}\n"
+            f"- **Bytes**: {writer.state['offset']:,}"
+        )
+
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error during NetWitness export: {e.response.status_code} - {e.response.text}")
+        error = f"NetWitness API Error: {e.response.status_code} - {e.response.text}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness export: {e!r}")
+        error = f"Timeout: {str(e) or type(e).__name__}"
+    except httpx.RequestError as e:
+        logger.error(f"Request error during NetWitness export: {e}")
+        error = f"Request Error: Unable to connect to NetWitness API. {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        error = f"An unexpected error occurred: {str(e)}"
+
+    return (
+        f"❌ Export Interrupted: {error}\n"
+        f"- **Path**: {path}\n"
+        f"- **Time Window**: `{time_filter}`\n"
+        f"- **Sessions Written**: {writer.state['rows']:,}\n"
+        f"- **Bytes**: {writer.state['offset']:,}\n"
+        f"Call export_sessions again with the same arguments to resume."
+    )
+
+
+@mcp.tool(annotations={"readOnlyHint": True,"sensitiveHint": "High"})
+@tool_call(prefetchable=True)
+async def diff_metakey_values(
+    meta_key: str,
+    where_clause: str = "",
+    time_range: str = "1h",
+    baseline_range: str = "24h",
+    limit: int = 25,
+    min_ratio: float = 3.0,
+    deadline_seconds: float = 0
+) -> str:
+    """Compares the values of a meta key in the current window (last time_range) with a baseline window (the baseline_range immediately before it) and returns only the differences: NEW values never seen in the baseline, VANISHED values seen in the baseline but not now, and CHANGED values whose per-hour rate moved by at least min_ratio (either direction). Use this for rare/new value hunting (e.g. new alias.host, client or ja3 values) instead of two query_metakey_values calls. Both windows are paged in full, not just their top-N. Time range examples: 30m, 1h, 24h. deadline_seconds (optional) caps the total time of the call; paging stops there and the partial comparison is returned."""
+
+    logger.info(f"Executing diff_metakey_values: meta_key='{meta_key}', where='{where_clause}', time={time_range}, baseline={baseline_range}, limit={limit}, min_ratio={min_ratio}")
+    start_deadline(deadline_seconds)
+
+    if not API_URL.strip():
+        return "❌ Error: NETWITNESS_API_URL is not configured."
+    if not API_USERNAME.strip() or not API_PASSWORD.strip():
+        return "❌ Error: NETWITNESS_USERNAME or NETWITNESS_PASSWORD are not configured."
+    if min_ratio <= 1:
+        return f"❌ Error: min_ratio must be greater than 1, got {min_ratio}"
+
+    import heapq
+    import math
+
+    current_start, current_end = calculate_time_window(time_range)
+    window_start, window_end = calculate_time_window(baseline_range)
+    baseline_start = current_start - (window_end - window_start)
+    baseline_end = current_start - timedelta(seconds=1)
+    current_seconds = max((current_end - current_start).total_seconds(), 1)
+    baseline_seconds = max((baseline_end - baseline_start).total_seconds(), 1)
+    current_filter = combine_where(where_clause, absolute_time_filter(current_start, current_end))
+    baseline_filter = combine_where(where_clause, absolute_time_filter(baseline_start, baseline_end))
+
+    # The current window is held as an exact value -> count table. Past NW_DIFF_EXACT_VALUES values, the
+    # remaining values only go into a Bloom filter (membership) plus the `limit` highest counts, which keeps
+    # memory bounded. The baseline is never stored: its pages are streamed against the current table.
+    current: dict = {}
+    overflow_top: list = []
+    overflow_bloom = None
+    baseline_counts: dict = {}
+    vanished_top: list = []
+    current_total = baseline_total = 0
+    current_stats, baseline_stats = {}, {}
+    baseline_pages: asyncio.Queue = asyncio.Queue(maxsize=4)
+
+    async def fetch_baseline(client: httpx.AsyncClient):
+        await feed_queue(baseline_pages, iter_metakey_values(client, meta_key, baseline_filter, baseline_stats))
+
+    try:
+        async with upstream_client(auth=(API_USERNAME, API_PASSWORD)) as client:
+            # Both windows are fetched concurrently; baseline pages are buffered (bounded) until the current table is complete
+            baseline_task = asyncio.create_task(fetch_baseline(client))
+            try:
+                async for page in iter_metakey_values(client, meta_key, current_filter, current_stats):
+                    for value, count in page:
+                        current_total += 1
+                        if len(current) < NW_DIFF_EXACT_VALUES:
+                            current[value] = count
+                            continue
+                        if overflow_bloom is None:
+                            from sketches import BloomFilter
+                            overflow_bloom = BloomFilter(NW_DIFF_EXACT_VALUES * 10)
+                        overflow_bloom.add(value)
+                        entry = (count, str(value), value)
+                        if len(overflow_top) < limit:
+                            heapq.heappush(overflow_top, entry)
+                        elif entry > overflow_top[0]:
+                            heapq.heapreplace(overflow_top, entry)
+
+                current.update((value, count) for count, _, value in overflow_top)
+
+                while (page := await baseline_pages.get()) is not None:
+                    for value, count in page:
+                        baseline_total += 1
+                        if value in current:
+                            baseline_counts[value] = count
+                        elif overflow_bloom is None or value not in overflow_bloom:
+                            entry = (count, str(value), value)
+                            if len(vanished_top) < limit:
+                                heapq.heappush(vanished_top, entry)
+                            elif entry > vanished_top[0]:
+                                heapq.heapreplace(vanished_top, entry)
+            finally:
+                baseline_task.cancel()
+                await asyncio.gather(baseline_task, return_exceptions=True)
+            if not baseline_task.cancelled():
+                baseline_task.result()
+
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error during NetWitness values diff: {e.response.status_code} - {e.response.text}")
+        return f"❌ NetWitness API Error: {e.response.status_code} - {e.response.text}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness values diff: {e!r}")
+        return deadline_error(e)
+    except httpx.RequestError as e:
+        logger.error(f"Request error during NetWitness values diff: {e}")
+        return f"❌ Request Error: Unable to connect to NetWitness API. {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        return f"❌ An unexpected error occurred: {str(e)}"
+
+    new_values = heapq.nlargest(limit, ((count, str(value), value) for value, count in current.items() if value not in baseline_counts))
+    vanished_values = sorted(vanished_top, reverse=True)
+
+    changed = []
+    for value, baseline_count in baseline_counts.items():
+        ratio = (current[value] / current_seconds) / (baseline_count / baseline_seconds) if baseline_count else float("inf")
+        if ratio >= min_ratio or ratio <= 1 / min_ratio:
+            changed.append((abs(math.log(ratio)), current[value], str(value), value, baseline_count, ratio))
+    changed_values = heapq.nlargest(limit, changed)
+
+    formatted_output = f"**'{meta_key}' Differences** (Last {time_range} vs previous {baseline_range})\n\n"
+    if where_clause.strip():
+        formatted_output += f"*Filter: {where_clause}*\n\n"
+    formatted_output += f"**Current Values**: {current_total:,} | **Baseline Values**: {baseline_total:,}\n"
+    if current_stats.get("deadline") or baseline_stats.get("deadline"):
+        formatted_output += "*Warning: value paging stopped at the deadline of this call; results are partial.*\n"
+    elif current_stats.get("truncated") or baseline_stats.get("truncated"):
+        formatted_output += f"*Warning: value paging stopped after {NW_VALUES_MAX_PAGES} pages; results are partial.*\n"
+    if overflow_bloom is not None:
+        formatted_output += f"*Note: more than {NW_DIFF_EXACT_VALUES:,} current values; values beyond that are compared approximately and only the top {limit} by count are ranked.*\n"
+
+    formatted_output += "\n### New Values (not seen in baseline)\n"
+    if new_values:
+        formatted_output += "| Value | Count |\n|-------|-------|\n"
+        formatted_output += "".join(f"| {value} | {count:,} |\n" for count, _, value in new_values)
+    else:
+        formatted_output += "None\n"
+
+    formatted_output += "\n### Vanished Values (seen in baseline only)\n"
+    if vanished_values:
+        formatted_output += "| Value | Baseline Count |\n|-------|-------|\n"
+        formatted_output += "".join(f"| {value} | {count:,} |\n" for count, _, value in vanished_values)
+    else:
+        formatted_output += "None\n"
+
+    formatted_output += f"\n### Changed Values (per-hour rate changed ≥ {min_ratio:g}x)\n"
+    if changed_values:
+        formatted_output += "| Value | Count | Baseline Count | Rate Ratio |\n|-------|-------|-------|-------|\n"
+        formatted_output += "".join(
+            f"| {value} | {count:,} | {baseline_count:,} | {ratio:.2f}x |\n"
+            for _, count, _, value, baseline_count, ratio in changed_values
+        )
+    else:
+        formatted_output += "None\n"
+
+    return formatted_output.strip()
+
+
 async def get_netwitness_token() -> str | None:
-    """Authenticates with Admin Server's API by posting credentials to the token endpoint and retrieves a JWT."""
+    """Authenticates with Admin Server's API by posting credentials to the token endpoint and retrieves a JWT.
+    Returns None when authentication fails; DeadlineExceeded and httpx timeouts are raised to the caller."""
     logger.info("Attempting to retrieve JWT token...")
     # Authentication endpoint for NetWitness
     auth_url = f"{NW_ADMIN_URL}/rest/api/auth/userpass"
@@ -817,18 +1827,18 @@ async def get_netwitness_token() -> str | None:
     }
 
     try:
-        async with httpx.AsyncClient(verify=False) as client:
+        async with upstream_client() as client:
             # We explicitly pass the credentials in the data field as form-encoded
             response = await client.post(
                 auth_url, 
                 data=payload, 
                 headers=headers,
-                timeout=10
+                timeout=request_timeout(AUTH_TIMEOUT_SECONDS)
             )
             response.raise_for_status()
             
             try:
-                data = response.json()
+                data = response_json(response)
                 token = data.get("accessToken")
 
                 if not token:
@@ -844,6 +1854,9 @@ async def get_netwitness_token() -> str | None:
             logger.info("Successfully retrieved JWT token.")
             return token
             
+    except (DeadlineExceeded, httpx.TimeoutException):
+        # Not a credentials problem: the caller reports it as a timeout
+        raise
     except httpx.HTTPStatusError as e:
         logger.error(f"Failed to get JWT token: HTTP {e.response.status_code} - {e.response.text}")
         return None
@@ -854,20 +1867,69 @@ async def get_netwitness_token() -> str | None:
         logger.error(f"Unexpected error during token retrieval: {e}", exc_info=True)
         return None
 
+def format_alerts(results: list, ioc_index) -> tuple[list[str], int]:
+    """Formats Admin API alert records as markdown lines separated by '---'. Returns the lines and the number of alerts with IOC matches."""
+    ioc_matches = 0
+    lines = []
+    for alert in results:
+        alert_id = alert.get('id')
+        alert_name = alert.get('name', 'N/A')
+        alert_priority = alert.get('priority')
+        alert_timestamp = alert.get('timestamp')
+        groupby_data = alert.get('alert', {})
+        alert_numevents = groupby_data.get('numEvents')
+        alert_ip_src = groupby_data.get('groupby_source_ip')
+        alert_ip_dst = groupby_data.get('groupby_destination_ip')
+        alert_port_dst = groupby_data.get('groupby_destination_port')
+        alert_domain = groupby_data.get('groupby_domain')
+        alert_domain_dst = groupby_data.get('groupby_domain_dst')
+
+        
+        # The timestamp in the alert response is typically in milliseconds epoch.
+        try:
+            ts_dt = datetime.fromtimestamp(alert_timestamp / 1000, tz=timezone.utc)
+            timestamp_str = ts_dt.isoformat().replace('+00:00', 'Z')
+        except:
+            timestamp_str = str(alert_timestamp)
+            
+        lines.append(f"**Name**: {alert_name}")
+        lines.append(f"- **Priority**: {alert_priority}")
+        lines.append(f"- **Time**: {timestamp_str}")
+        lines.append(f"- **Alert ID**: {alert_id}")
+        lines.append(f"- **Number of Events**: {alert_numevents}")
+        annotations = [ioc_annotation(ioc_index, value) for value in (alert_ip_src, alert_ip_dst, alert_domain, alert_domain_dst)]
+        ioc_matches += any(annotations)
+        lines.append(f"- **Source IP**: {alert_ip_src}{annotations[0]}")
+        lines.append(f"- **Destination IP**: {alert_ip_dst}{annotations[1]}")
+        lines.append(f"- **Destination Port**: {alert_port_dst}")
+        lines.append(f"- **Domain**: {alert_domain}{annotations[2]}")
+        lines.append(f"- **Destination Domain**: {alert_domain_dst}{annotations[3]}")
+        lines.append("---")
+
+    return lines, ioc_matches
+
 @mcp.tool(annotations={"readOnlyHint": True,"sensitiveHint": "High"})
+@tool_call(prefetchable=True)
 async def query_alerts(
     time_range: str = "1h",
-    max_results: int = 100
+    max_results: int = 100,
+    deadline_seconds: float = 0
 ) -> str:
-    """Retrieves NetWitness alerts in a specified time range (e.g., 30m, 1h, 24h). This uses JWT authentication for the Alert API. Returns a list of alert records including title, severity, and timestamp."""
+    """Retrieves NetWitness alerts in a specified time range (e.g., 30m, 1h, 24h). This uses JWT authentication for the Alert API. Returns a list of alert records including title, severity, and timestamp. deadline_seconds (optional) caps the total time of the call."""
     
     logger.info(f"Executing query_alerts: time={time_range}, limit={max_results}")
+    start_deadline(deadline_seconds)
 
     if not NW_ADMIN_URL.strip():
         return "❌ Error: NW_ADMIN_URL is not configured."
     
     # --- AUTHENTICATION STEP ---
-    jwt_token = await get_netwitness_token()
+    try:
+        with phase("auth"):
+            jwt_token = await get_netwitness_token()
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness authentication: {e!r}")
+        return deadline_error(e, AUTH_TIMEOUT_SECONDS)
     if not jwt_token:
         return "❌ Authentication Error: Failed to retrieve a JWT token. Check NW_ADMIN_USERNAME/PASSWORD or NW_ADMIN_URL."
     
@@ -887,10 +1949,10 @@ async def query_alerts(
 
     try:
         # Note: No auth=(...) here. The JWT token is passed in the headers.
-        async with httpx.AsyncClient(headers=headers, verify=False) as client:
-            response = await client.get(url, timeout=30)
+        async with upstream_client(headers=headers) as client:
+            response = await client.get(url, timeout=request_timeout())
             response.raise_for_status()
-            data = response.json()
+            data = response_json(response)
 
             results = data.get('items', [])
            
@@ -899,42 +1961,14 @@ async def query_alerts(
             
             formatted_output = f"**NetWitness Alerts** (Last {time_range})\n\n"
             
-            lines = []
-            for alert in results:
-                alert_id = alert.get('id')
-                alert_name = alert.get('name', 'N/A')
-                alert_priority = alert.get('priority')
-                alert_timestamp = alert.get('timestamp')
-                groupby_data = alert.get('alert', {})
-                alert_numevents = groupby_data.get('numEvents')
-                alert_ip_src = groupby_data.get('groupby_source_ip')
-                alert_ip_dst = groupby_data.get('groupby_destination_ip')
-                alert_port_dst = groupby_data.get('groupby_destination_port')
-                alert_domain = groupby_data.get('groupby_domain')
-                alert_domain_dst = groupby_data.get('groupby_domain_dst')
-
-                
-                # The timestamp in the alert response is typically in milliseconds epoch.
-                try:
-                    ts_dt = datetime.fromtimestamp(alert_timestamp / 1000, tz=timezone.utc)
-                    timestamp_str = ts_dt.isoformat().replace('+00:00', 'Z')
-                except:
-                    timestamp_str = str(alert_timestamp)
-                    
-                lines.append(f"**Name**: {alert_name}")
-                lines.append(f"- **Priority**: {alert_priority}")
-                lines.append(f"- **Time**: {timestamp_str}")
-                lines.append(f"- **Alert ID**: {alert_id}")
-                lines.append(f"- **Number of Events**: {alert_numevents}")
-                lines.append(f"- **Source IP**: {alert_ip_src}")
-                lines.append(f"- **Destination IP**: {alert_ip_dst}")
-                lines.append(f"- **Destination Port**: {alert_port_dst}")
-                lines.append(f"- **Domain**: {alert_domain}")
-                lines.append(f"- **Destination Domain**: {alert_domain_dst}")
-                lines.append("---")
+            ioc_index = await get_ioc_index()
+            with phase("format"):
+                lines, ioc_matches = format_alerts(results, ioc_index)
             
             formatted_output += "\n".join(lines[:-1]) # remove trailing ---
             formatted_output += f"\n\n**Total Alerts**: {len(results)}"
+            if ioc_index is not None:
+                formatted_output += f"\n**Alerts with IOC Matches**: {ioc_matches}"
             
             return formatted_output.strip()
 
@@ -942,6 +1976,9 @@ async def query_alerts(
         error_msg = e.response.text
         logger.error(f"HTTP error during NetWitness alert query: {e.response.status_code} - {error_msg}")
         return f"❌ NetWitness Alert API Error: {e.response.status_code} - {error_msg}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness alert query: {e!r}")
+        return deadline_error(e)
     except httpx.RequestError as e:
         logger.error(f"Request error during NetWitness alert query: {e}")
         return f"❌ Request Error: Unable to connect to NetWitness API. {str(e)}"
@@ -950,6 +1987,523 @@ async def query_alerts(
         return f"❌ An unexpected error occurred: {str(e)}"
 
 
+def pivot_query(select_part: str, where: str, time_filter: str) -> str:
+    """The SDK query of one pivot batch; with an empty where, the fixed part that batch_where_clauses is sized against."""
+    return f"{select_part} where {where} && {time_filter}"
+
+def batch_where_clauses(indicators: dict[str, list], fixed_length: int, max_length: int) -> list[str]:
+    """Packs {meta_key: [values]} into as few OR-ed multi-value clauses (ip.src=a,b || ip.dst=c) as fit in max_length
+    once URL-encoded, where fixed_length is the encoded length of the rest of the URL."""
+    batches = []
+    clauses: dict[str, list] = {}
+    # URL encoding is per character, so encoded lengths add up piece by piece
+    length = fixed_length + len(quote_plus("()"))
+    for meta_key, values in indicators.items():
+        for value in values:
+            literal = meta_value_literal(meta_key, value)
+            piece = f",{literal}" if meta_key in clauses else f"{' || ' if clauses else ''}{meta_key}={literal}"
+            if clauses and length + len(quote_plus(piece)) > max_length:
+                batches.append(clauses)
+                clauses = {}
+                length = fixed_length + len(quote_plus("()"))
+                piece = f"{meta_key}={literal}"
+            clauses.setdefault(meta_key, []).append(literal)
+            length += len(quote_plus(piece))
+    if clauses:
+        batches.append(clauses)
+    return ["(" + " || ".join(f"{key}={','.join(values)}" for key, values in batch.items()) + ")" for batch in batches]
+
+@mcp.tool(annotations={"readOnlyHint": True,"sensitiveHint": "High"})
+@tool_call(prefetchable=True)
+async def pivot_alerts_to_sessions(
+    time_range: str = "1h",
+    alert_ids: str = "",
+    select_clause: str = "",
+    max_alerts: int = 50,
+    max_sessions_per_alert: int = 10,
+    max_results: int = 1000,
+    deadline_seconds: float = 0
+) -> str:
+    """Pivots from NetWitness alerts to their matching sessions in one call. Takes the alerts in time_range (optionally only the comma-separated alert_ids), collects their group-by indicators (source IP -> ip.src, destination IP -> ip.dst, domain -> alias.host), queries the sessions for all of them in a few batched queries over the same time range, and lists the matching sessions under each alert. Use this instead of one query_sessions call per alert. max_results is the SDK result size per batched query. deadline_seconds (optional) caps the total time of the call; batches not finished by then are reported as missing."""
+
+    logger.info(f"Executing pivot_alerts_to_sessions: time={time_range}, ids='{alert_ids}', select='{select_clause}', alerts={max_alerts}, per_alert={max_sessions_per_alert}")
+    start_deadline(deadline_seconds)
+
+    if not NW_ADMIN_URL.strip():
+        return "❌ Error: NW_ADMIN_URL is not configured."
+    if not API_URL.strip():
+        return "❌ Error: NETWITNESS_API_URL is not configured."
+    if not API_USERNAME.strip() or not API_PASSWORD.strip():
+        return "❌ Error: NETWITNESS_USERNAME or NETWITNESS_PASSWORD are not configured."
+
+    try:
+        with phase("auth"):
+            jwt_token = await get_netwitness_token()
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness authentication: {e!r}")
+        return deadline_error(e, AUTH_TIMEOUT_SECONDS)
+    if not jwt_token:
+        return "❌ Authentication Error: Failed to retrieve a JWT token. Check NW_ADMIN_USERNAME/PASSWORD or NW_ADMIN_URL."
+
+    start_dt, end_dt = calculate_time_window(time_range)
+    start_time = start_dt.isoformat().replace('+00:00', 'Z')
+    end_time = end_dt.isoformat().replace('+00:00', 'Z')
+    wanted_ids = {alert_id.strip() for alert_id in alert_ids.split(",") if alert_id.strip()}
+    page_size = 1000 if wanted_ids else max_alerts
+    url = f"{NW_ADMIN_URL}/rest/api/alerts?since={quote_plus(start_time)}&until={quote_plus(end_time)}&pageSize={page_size}"
+    headers = {
+        "NetWitness-Token": jwt_token,
+        "Accept": "application/json;charset=UTF-8"
+    }
+
+    try:
+        async with upstream_client(headers=headers) as client:
+            response = await client.get(url, timeout=request_timeout())
+            response.raise_for_status()
+            alerts = response_json(response).get('items', [])
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error during NetWitness alert query: {e.response.status_code} - {e.response.text}")
+        return f"❌ NetWitness Alert API Error: {e.response.status_code} - {e.response.text}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness alert query: {e!r}")
+        return deadline_error(e)
+    except httpx.RequestError as e:
+        logger.error(f"Request error during NetWitness alert query: {e}")
+        return f"❌ Request Error: Unable to connect to NetWitness API. {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        return f"❌ An unexpected error occurred: {str(e)}"
+
+    if wanted_ids:
+        alerts = [alert for alert in alerts if str(alert.get('id')) in wanted_ids]
+    alerts = alerts[:max_alerts]
+    if not alerts:
+        return f"No alerts found for the given time range ({time_range})."
+
+    # Deduplicate indicators across alerts, remembering which alerts each (meta key, value) belongs to
+    owners: dict[tuple[str, str], list[int]] = {}
+    for position, alert in enumerate(alerts):
+        groupby_data = alert.get('alert', {})
+        for field, meta_key in ALERT_PIVOT_FIELDS.items():
+            values = groupby_data.get(field)
+            for value in (values if isinstance(values, list) else [values]):
+                if value not in (None, ""):
+                    owners.setdefault((meta_key, str(value)), []).append(position)
+
+    if not owners:
+        return f"None of the {len(alerts)} alerts have source IP, destination IP or domain indicators to pivot on."
+
+    indicators: dict[str, list] = {}
+    for meta_key, value in sorted(owners):
+        indicators.setdefault(meta_key, []).append(value)
+
+    select_fields = [field.strip() for field in select_clause.split(",") if field.strip()]
+    if select_fields and "*" not in select_fields:
+        select_fields += [meta_key for meta_key in indicators if meta_key not in select_fields]
+        select_part = f"select {','.join(select_fields)}"
+    else:
+        select_part = "select *"
+    time_filter = absolute_time_filter(start_dt, end_dt)
+
+    fixed_length = len(sdk_url(session_page_params(pivot_query(select_part, "", time_filter), max_results)))
+    batches = batch_where_clauses(indicators, fixed_length, NW_PIVOT_MAX_URL_LENGTH)
+    semaphore = asyncio.Semaphore(NW_PIVOT_CONCURRENCY)
+
+    async def run_batch(client: httpx.AsyncClient, where: str):
+        async with semaphore:
+            try:
+                fields, _ = await fetch_session_page(client, pivot_query(select_part, where, time_filter), max_results)
+            except (DeadlineExceeded, httpx.TimeoutException):
+                # Past the deadline, report the batch as missing instead of failing the finished ones
+                if not deadline_expired():
+                    raise
+                return None
+            return fields
+
+    try:
+        async with upstream_client(auth=(API_USERNAME, API_PASSWORD)) as client:
+            pages = await gather_or_cancel(*(run_batch(client, where) for where in batches))
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error during NetWitness pivot query: {e.response.status_code} - {e.response.text}")
+        return f"❌ NetWitness API Error: {e.response.status_code} - {e.response.text}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness pivot query: {e!r}")
+        return deadline_error(e)
+    except httpx.RequestError as e:
+        logger.error(f"Request error during NetWitness pivot query: {e}")
+        return f"❌ Request Error: Unable to connect to NetWitness API. {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        return f"❌ An unexpected error occurred: {str(e)}"
+
+    # Attach each session to every alert owning one of its indicator values
+    matches: list[dict] = [{} for _ in alerts]
+    missing_batches = sum(fields is None for fields in pages)
+    pages = [fields for fields in pages if fields is not None]
+    truncated_batches = sum(1 for fields in pages if len(fields) >= max_results)
+    for fields in pages:
+        for session in sessions_from_fields(fields):
+            for meta_key in indicators:
+                values = session.get(meta_key)
+                for value in (values if isinstance(values, list) else [values]):
+                    for position in owners.get((meta_key, str(value)), ()):
+                        matches[position].setdefault(session['sessionid'], session)
+
+    formatted_output = f"**Alert to Session Pivot** (Last {time_range})\n\n"
+    formatted_output += f"*{len(alerts)} alerts, {len(owners)} unique indicators, {len(batches)} upstream session queries*\n"
+    if missing_batches:
+        formatted_output += f"*Warning: {missing_batches} of {len(batches)} batched queries did not finish before the deadline; sessions are partial.*\n"
+    if truncated_batches:
+        formatted_output += f"*Warning: {truncated_batches} batched queries reached max_results ({max_results}); some sessions may be missing.*\n"
+
+    lines = []
+    for alert, sessions in zip(alerts, matches):
+        groupby_data = alert.get('alert', {})
+        lines.append(f"\n**Name**: {alert.get('name', 'N/A')}")
+        lines.append(f"- **Alert ID**: {alert.get('id')}")
+        for field, meta_key in ALERT_PIVOT_FIELDS.items():
+            values = groupby_data.get(field)
+            if values not in (None, "", []):
+                lines.append(f"- **{meta_key}**: {', '.join(map(str, values)) if isinstance(values, list) else values}")
+        lines.append(f"- **Matching Sessions**: {len(sessions)}")
+        for session in list(sessions.values())[:max_sessions_per_alert]:
+            details = ", ".join(
+                f"{key}={'|'.join(map(str, value)) if isinstance(value, list) else value}"
+                for key, value in session.items() if key != 'sessionid'
+            )
+            lines.append(f"  - **Session {session['sessionid']}**: {details}")
+        if len(sessions) > max_sessions_per_alert:
+            lines.append(f"  - ... {len(sessions) - max_sessions_per_alert} more")
+        lines.append("---")
+
+    formatted_output += "\n".join(lines[:-1])
+    return formatted_output.strip()
+
+
+def session_epoch(value) -> float | None:
+    """Converts a session 'time' meta value (epoch seconds, or a date string) to epoch seconds."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        for fmt in ("%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%d %H:%M:%S", "%Y-%b-%d %H:%M:%S"):
+            try:
+                parsed = datetime.strptime(value.replace("Z", "+0000"), fmt)
+                return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+            except ValueError:
+                continue
+    return None
+
+@mcp.tool(annotations={"readOnlyHint": True,"sensitiveHint": "High"})
+@tool_call()
+async def simulate_esa_rule(
+    where_clause: str,
+    group_by: str = "ip.src",
+    distinct_field: str = "ad.username.src",
+    window_seconds: int = 60,
+    batch_size: int = 20,
+    threshold: int = 10,
+    time_range: str = "24h",
+    suppress_minutes: int = 30,
+    reclaim_aged_seconds: int = 120,
+    max_firings: int = 50,
+    deadline_seconds: float = 0
+) -> str:
+    """Backtests an ESA windowed distinct-count rule against historical sessions without deploying it. Streams the sessions matching where_clause in time order through std:groupwin(group_by).win:time_length_batch(window_seconds, batch_size).std:unique(distinct_field) having count(*) >= threshold, output first every suppress_minutes, with reclaim_group_aged=reclaim_aged_seconds, and reports which groups would have fired and when. Example (Kerberos_Account_Scanning): where_clause="medium=1 && error='kdc err c principal unknown'", group_by="ip.src", distinct_field="ad.username.src", window_seconds=60, batch_size=20, threshold=10, suppress_minutes=30, reclaim_aged_seconds=120. deadline_seconds (optional, default NW_STREAM_DEADLINE_SECONDS) caps the total time of the call; the replay stops there and reports the partial result."""
+
+    logger.info(f"Executing simulate_esa_rule: where='{where_clause}', group_by={group_by}, distinct={distinct_field}, window={window_seconds}s/{batch_size}, threshold={threshold}, time={time_range}")
+    start_deadline(deadline_seconds, NW_STREAM_DEADLINE_SECONDS)
+
+    if not API_URL.strip():
+        return "❌ Error: NETWITNESS_API_URL is not configured."
+    if not API_USERNAME.strip() or not API_PASSWORD.strip():
+        return "❌ Error: NETWITNESS_USERNAME or NETWITNESS_PASSWORD are not configured."
+    if window_seconds <= 0 or batch_size <= 0 or threshold <= 0:
+        return "❌ Error: window_seconds, batch_size and threshold must be positive."
+
+    from esa_simulator import GroupedWindowSimulator
+
+    simulator = GroupedWindowSimulator(
+        window_seconds=window_seconds,
+        batch_size=batch_size,
+        threshold=threshold,
+        suppress_seconds=suppress_minutes * 60,
+        reclaim_aged_seconds=reclaim_aged_seconds if reclaim_aged_seconds > 0 else None
+    )
+    firings: list = []
+
+    def record(new_firings: list):
+        for firing in new_firings:
+            if len(firings) < max_firings:
+                firings.append(firing)
+
+    start_dt, end_dt = calculate_time_window(time_range)
+    query_str = f"select time,{group_by},{distinct_field} where {combine_where(where_clause, absolute_time_filter(start_dt, end_dt))}"
+    pages: asyncio.Queue = asyncio.Queue(maxsize=2)
+    skipped = 0
+    stopped_at_deadline = False
+
+    async def produce(client: httpx.AsyncClient):
+        await feed_queue(pages, (sessions async for sessions, _, _ in iter_sessions(client, query_str, NW_EXPORT_PAGE_SIZE)))
+
+    try:
+        async with upstream_client(auth=(API_USERNAME, API_PASSWORD)) as client:
+            # The next page is fetched while the current one is evaluated; at most two pages are held in memory
+            producer = asyncio.create_task(produce(client))
+            try:
+                while (sessions := await pages.get()) is not None:
+                    events = []
+                    for session in sessions:
+                        timestamp = session_epoch(session.get('time'))
+                        group = session.get(group_by)
+                        if timestamp is None or group is None:
+                            skipped += 1
+                            continue
+                        values = session.get(distinct_field, [])
+                        values = values if isinstance(values, list) else [values]
+                        for group_value in (group if isinstance(group, list) else [group]):
+                            events.append((timestamp, group_value, values))
+                    events.sort(key=lambda event: event[0])
+                    for timestamp, group_value, values in events:
+                        record(simulator.process(timestamp, group_value, values))
+                record(simulator.finish())
+            finally:
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+            if not producer.cancelled():
+                try:
+                    producer.result()
+                except DeadlineExceeded:
+                    stopped_at_deadline = True
+
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error during ESA simulation: {e.response.status_code} - {e.response.text}")
+        return f"❌ NetWitness API Error: {e.response.status_code} - {e.response.text}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during ESA simulation: {e!r}")
+        return deadline_error(e)
+    except httpx.RequestError as e:
+        logger.error(f"Request error during ESA simulation: {e}")
+        return f"❌ Request Error: Unable to connect to NetWitness API. {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        return f"❌ An unexpected error occurred: {str(e)}"
+
+    stats = simulator.stats
+    formatted_output = f"**ESA Rule Simulation** (Last {time_range})\n\n"
+    formatted_output += f"*Filter: {where_clause}*\n\n"
+    formatted_output += (
+        f"*Rule: groupwin({group_by}).time_length_batch({window_seconds} seconds, {batch_size}).unique({distinct_field}) "
+        f"having count(*) >= {threshold}, output first every {suppress_minutes} min, reclaim_group_aged={reclaim_aged_seconds}*\n\n"
+    )
+    formatted_output += f"- **Sessions Replayed**: {stats['events']:,}"
+    if skipped:
+        formatted_output += f" ({skipped:,} without time or {group_by} skipped)"
+    formatted_output += f"\n- **Peak Active Groups**: {stats['peak_groups']:,} ({stats['groups_reclaimed']:,} reclaimed as aged)"
+    formatted_output += f"\n- **Batches Evaluated**: {stats['batches']:,}"
+    formatted_output += f"\n- **Firings**: {stats['firings']:,} ({stats['suppressed']:,} more suppressed by the output rate limit)"
+    if stats['late_events']:
+        formatted_output += f"\n- **Out-of-order Sessions**: {stats['late_events']:,} (evaluated at the latest seen time)"
+    if stopped_at_deadline:
+        replayed_to = datetime.fromtimestamp(simulator.clock, tz=timezone.utc).isoformat().replace('+00:00', 'Z') if stats['events'] else "the start"
+        formatted_output += f"\n\n*Warning: the replay stopped at the deadline of this call after sessions up to {replayed_to}; results are partial.*"
+
+    if not firings:
+        return formatted_output + "\n\nThe rule would not have fired in this time range."
+
+    firings.sort(key=lambda firing: firing["time"])
+    formatted_output += f"\n\n| Time (UTC) | {group_by} | Distinct {distinct_field} | Events | Sample Values |\n"
+    formatted_output += "|-------|-------|-------|-------|-------|\n"
+    for firing in firings:
+        fired_at = datetime.fromtimestamp(firing["time"], tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+        formatted_output += f"| {fired_at} | {firing['group']} | {firing['distinct']} | {firing['events']} | {', '.join(firing['sample'])} |\n"
+    if stats['firings'] > len(firings):
+        formatted_output += f"\n*Showing the first {len(firings)} of {stats['firings']:,} firings.*"
+
+    return formatted_output.strip()
+
+
+async def profile_metakey(client: httpx.AsyncClient, meta_key: str, where_filter: str, top_n: int) -> dict:
+    """Pages through every value of a meta key and summarizes it in bounded memory: HyperLogLog distinct count,
+    KLL quantiles of the per-value session counts, and the top-N values by count."""
+    import heapq
+    from sketches import HyperLogLog, KLLSketch
+
+    distinct = HyperLogLog()
+    counts = KLLSketch()
+    top: list = []
+    total_sessions = 0
+    stats: dict = {}
+    async for page in iter_metakey_values(client, meta_key, where_filter, stats):
+        for value, count in page:
+            distinct.add(value)
+            counts.add(count)
+            total_sessions += count
+            entry = (count, str(value))
+            if len(top) < top_n:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+
+    top = sorted(top, reverse=True)
+    return {
+        "distinct": distinct.estimate(),
+        "values_scanned": counts.n,
+        "sessions": total_sessions,
+        "top": top,
+        "top_share": sum(count for count, _ in top) / total_sessions if total_sessions else 0.0,
+        "p50": counts.quantile(0.5),
+        "p90": counts.quantile(0.9),
+        "p99": counts.quantile(0.99),
+        "singleton_share": counts.rank(1),
+        "truncated": stats.get("truncated", False),
+        "deadline": stats.get("deadline", False),
+    }
+
+@mcp.tool(annotations={"readOnlyHint": True,"sensitiveHint": "High"})
+@tool_call(prefetchable=True)
+async def profile_metakeys(
+    meta_keys: str,
+    where_clause: str = "",
+    time_range: str = "1h",
+    top_n: int = 10,
+    deadline_seconds: float = 0
+) -> str:
+    """Profiles the value distribution of one or more comma-separated meta keys before writing a query: estimated number of distinct values, total sessions, share of sessions covered by the top_n values, quantiles of sessions per value (p50/p90/p99) and the share of values seen only once. Use this to decide whether a top-N from query_metakey_values is meaningful (e.g. alias.host with 50 vs 5 million values). Scans the full value list with fixed memory; results are cached per key, filter and time range for a few minutes. deadline_seconds (optional) caps the total time of the call; keys not fully scanned by then are reported as lower bounds."""
+
+    logger.info(f"Executing profile_metakeys: meta_keys='{meta_keys}', where='{where_clause}', time={time_range}, top_n={top_n}")
+    start_deadline(deadline_seconds)
+
+    if not API_URL.strip():
+        return "❌ Error: NETWITNESS_API_URL is not configured."
+    if not API_USERNAME.strip() or not API_PASSWORD.strip():
+        return "❌ Error: NETWITNESS_USERNAME or NETWITNESS_PASSWORD are not configured."
+
+    keys = [key.strip() for key in meta_keys.split(",") if key.strip()]
+    if not keys:
+        return "❌ Error: meta_keys must list at least one meta key."
+
+    where_filter = combine_where(where_clause, f"time=rtp(now,{time_range})-u")
+    profiles, cached_at = {}, {}
+    missing = []
+    for key in keys:
+        entry = _profile_cache.get((key, where_clause.strip(), time_range, top_n))
+        if entry:
+            profiles[key], cached_at[key] = entry
+        else:
+            missing.append(key)
+
+    try:
+        if missing:
+            async with upstream_client(auth=(API_USERNAME, API_PASSWORD)) as client:
+                results = await gather_or_cancel(*(profile_metakey(client, key, where_filter, top_n) for key in missing))
+            for key, profile in zip(missing, results):
+                profiles[key] = profile
+                if not profile["deadline"]:
+                    _profile_cache.put((key, where_clause.strip(), time_range, top_n), profile)
+
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error during NetWitness profile query: {e.response.status_code} - {e.response.text}")
+        return f"❌ NetWitness API Error: {e.response.status_code} - {e.response.text}"
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Timeout during NetWitness profile query: {e!r}")
+        return deadline_error(e)
+    except httpx.RequestError as e:
+        logger.error(f"Request error during NetWitness profile query: {e}")
+        return f"❌ Request Error: Unable to connect to NetWitness API. {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        return f"❌ An unexpected error occurred: {str(e)}"
+
+    formatted_output = f"**Meta Key Profile** (Last {time_range})\n\n"
+    if where_clause.strip():
+        formatted_output += f"*Filter: {where_clause}*\n\n"
+
+    formatted_output += f"| Meta Key | Distinct Values (est.) | Sessions | Top {top_n} Share | Sessions/Value p50 | p90 | p99 | Seen Once |\n"
+    formatted_output += "|-------|-------|-------|-------|-------|-------|-------|-------|\n"
+    for key in keys:
+        profile = profiles[key]
+        distinct = f"{profile['distinct']:,}" + ("+" if profile["truncated"] else "")
+        if not profile["values_scanned"]:
+            formatted_output += f"| {key} | 0 | 0 | - | - | - | - | - |\n"
+            continue
+        formatted_output += (
+            f"| {key} | {distinct} | {profile['sessions']:,} | {profile['top_share']:.1%} | "
+            f"{profile['p50']:,} | {profile['p90']:,} | {profile['p99']:,} | {profile['singleton_share']:.1%} |\n"
+        )
+
+    for key in keys:
+        profile = profiles[key]
+        if not profile["top"]:
+            continue
+        formatted_output += f"\n**Top {len(profile['top'])} '{key}' values**: "
+        formatted_output += ", ".join(f"{value} ({count:,})" for count, value in profile["top"])
+        if key in cached_at:
+            formatted_output += f" *(cached {int(time.time() - cached_at[key])}s ago)*"
+
+    if any(profile["deadline"] for profile in profiles.values()):
+        formatted_output += "\n\n*+ : value paging stopped at the deadline of this call (or the page limit); the key has at least this many values.*"
+    elif any(profile["truncated"] for profile in profiles.values()):
+        formatted_output += f"\n\n*+ : value paging stopped after {NW_VALUES_MAX_PAGES} pages; the key has at least this many values.*"
+
+    return formatted_output.strip()
+
+
+@mcp.tool(annotations={"readOnlyHint": False})
+async def capture_tool_profiles(
+    calls: int = 1,
+    mode: str = "cprofile",
+    tool_name: str = ""
+) -> str:
+    """Admin: profiles the next `calls` tool calls (only calls of tool_name, if given) to find where a slow tool spends its time. Each captured call writes artifacts to NW_PROFILE_DIR on the server: a JSON report with per-phase timers (auth, connect, send, ttfb, download, decode, format) and the worst event loop lag during the call, plus either a cProfile profile (mode='cprofile', a .prof file for pstats/snakeviz) or a low-overhead stack sample (mode='sample', a .folded file for flame graphs). calls=0 disarms capture. Returns the capture status, event loop lag statistics and the reports of recent captures."""
+
+    logger.info(f"Executing capture_tool_profiles: calls={calls}, mode={mode}, tool='{tool_name}'")
+
+    from profiling import MODES, ProfileCapture
+
+    if mode not in MODES:
+        return f"❌ Error: mode must be one of {', '.join(MODES)}, got '{mode}'"
+    tool_name = tool_name.strip()
+    if tool_name and tool_name not in _tool_functions:
+        return f"❌ Error: unknown tool '{tool_name}'. Profilable tools: {', '.join(sorted(_tool_functions))}"
+
+    capture = _profiling["capture"]
+    if capture is None:
+        capture = _profiling["capture"] = ProfileCapture(NW_PROFILE_DIR, _profiling["lag_monitor"])
+    capture.arm(calls, mode, tool_name)
+
+    formatted_output = "**Profile Capture**\n\n"
+    if capture.remaining:
+        formatted_output += f"- **Armed**: next {capture.remaining} call(s) of {tool_name or 'any tool'} ({mode})\n"
+    else:
+        formatted_output += "- **Armed**: no\n"
+    formatted_output += f"- **Artifacts**: {NW_PROFILE_DIR}\n"
+
+    monitor = _profiling["lag_monitor"]
+    if monitor is not None:
+        lag = monitor.stats()
+        formatted_output += f"- **Event Loop Lag**: mean {lag['mean_ms']:.1f} ms, max {lag['max_ms']:.1f} ms over {lag['samples']:,} samples\n"
+    else:
+        formatted_output += "- **Event Loop Lag**: monitor disabled (NW_LOOP_LAG_INTERVAL_MS=0)\n"
+
+    if capture.reports:
+        formatted_output += "\n| Started (UTC) | Tool | Outcome | Wall ms | Phases ms | Loop Lag ms | Profile |\n"
+        formatted_output += "|-------|-------|-------|-------|-------|-------|-------|\n"
+        for report in reversed(capture.reports):
+            phases = ", ".join(f"{name} {ms:,.1f}" for name, ms in report["phases_ms"].items()) or "-"
+            formatted_output += (
+                f"| {report['started']} | {report['tool']} | {report['outcome']} | {report['wall_ms']:,.1f} | {phases} | "
+                f"{report.get('loop_lag_max_ms', '-')} | {report['profile']} |\n"
+            )
+
+    return formatted_output.strip()
+
+
 # === SERVER STARTUP ===
 if __name__ == "__main__":
     logger.info("Starting NetWitness MCP server...")
@@ -960,8 +2514,10 @@ if __name__ == "__main__":
         logger.warning("NETWITNESS_USERNAME environment variable is not set.")
     if not API_PASSWORD:
         logger.warning("NETWITNESS_PASSWORD environment variable is not set.")
+    if NW_IOC_FEED_DIR:
+        logger.info(f"Offline IOC enrichment enabled from {NW_IOC_FEED_DIR} (index: {NW_IOC_INDEX_PATH}).")
     
-    logger.info("Available tools: query_sessions, query_metakey_values, query_alerts, get_netwitness_meta_keys, get_netwitness_query_syntax")
+    logger.info("Available tools: query_sessions, query_metakey_values, query_alerts, export_sessions, diff_metakey_values, pivot_alerts_to_sessions, simulate_esa_rule, profile_metakeys, capture_tool_profiles, get_netwitness_meta_keys, get_netwitness_query_syntax")
     logger.info("Available resources: netwitness://meta-keys, netwitness://query-syntax")
     
     try:
@@ -0,0 +1,241 @@
+"""
+Profiling - On-demand capture of tool calls, to find out where a slow call spends its time in production.
+
+A capture is armed for the next N tool calls (see the capture_tool_profiles tool). Every captured call records:
+  - per-phase timers: auth, connect, send, ttfb, download (from httpcore trace events), decode and format;
+  - a cProfile profile (every Python call) or a stack-sampling profile (low overhead, folded stacks for flame graphs);
+  - the worst event loop lag seen during the call.
+Phase times are summed over all upstream requests of the call, so with concurrent requests they can add up to more
+than the wall time. The profilers see the whole event loop thread, including other calls running at the same time.
+
+Artifacts are written to the capture directory as <timestamp>-<tool>.prof (or .folded) plus a .json report.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+logger = logging.getLogger("netwitness-mcp-server.profiling")
+
+MODES = ("cprofile", "sample")
+
+# httpcore trace event -> phase
+HTTP_PHASES = {
+    "connect_tcp": "connect",
+    "start_tls": "connect",
+    "send_request_headers": "send",
+    "send_request_body": "send",
+    "receive_response_headers": "ttfb",
+    "receive_response_body": "download",
+}
+
+# Phase -> seconds for the tool call being captured; None when the call is not captured
+_phases: ContextVar[dict | None] = ContextVar("phases", default=None)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """Times a block as one phase of the captured tool call (a no-op when the call is not captured)."""
+    if _phases.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+async def trace_request(request) -> None:
+    """httpx request hook: while a call is captured, asks httpcore to report the connection and transfer steps of the request."""
+    if _phases.get() is None:
+        return
+    started: dict[str, float] = {}
+
+    async def trace(event_name: str, info: dict) -> None:
+        name, _, stage = event_name.rpartition(".")
+        step = HTTP_PHASES.get(name.rpartition(".")[2])
+        if step is None:
+            return
+        if stage == "started":
+            started[name] = time.perf_counter()
+        elif name in started:
+            record_phase(step, time.perf_counter() - started.pop(name))
+
+    request.extensions["trace"] = trace
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task, which is how long something blocked the loop."""
+
+    def __init__(self, interval: float, warn_after: float):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.recent: deque = deque(maxlen=2048)
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            self.recent.append((time.monotonic(), lag))
+            if lag >= self.warn_after:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms.")
+
+    def max_since(self, since: float) -> float:
+        """Returns the worst lag measured since the given time.monotonic() value."""
+        return max((lag for at, lag in self.recent if at >= since), default=0.0)
+
+    def stats(self) -> dict:
+        return {
+            "samples": self.samples,
+            "mean_ms": self.total_lag / self.samples * 1000 if self.samples else 0.0,
+            "max_ms": self.max_lag * 1000,
+        }
+
+
+class StackSampler:
+    """Samples the stack of one thread (the event loop's) from a background thread, counting folded stacks."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class ProfileCapture:
+    """Profiles the next `remaining` tool calls (optionally of one tool only), one call at a time."""
+
+    def __init__(self, output_dir: str, lag_monitor: LoopLagMonitor | None = None):
+        self.output_dir = output_dir
+        self.lag_monitor = lag_monitor
+        self.remaining = 0
+        self.mode = "cprofile"
+        self.tool = ""
+        self.active = False
+        self.reports: deque = deque(maxlen=10)
+
+    def arm(self, calls: int, mode: str, tool: str) -> None:
+        self.remaining = max(0, calls)
+        self.mode = mode
+        self.tool = tool
+
+    def claim(self, tool: str) -> bool:
+        """Returns True if this call of `tool` is to be captured. Only one call is captured at a time, since the
+        profilers cover the whole event loop thread."""
+        if not self.remaining or self.active or (self.tool and self.tool != tool):
+            return False
+        self.remaining -= 1
+        self.active = True
+        return True
+
+    async def run(self, tool: str, func, args: tuple, kwargs: dict):
+        """Runs a claimed tool call under the profiler and writes its artifacts."""
+        phases: dict = {}
+        token = _phases.set(phases)
+        profiler = sampler = None
+        if self.mode == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+
+        started_at = time.time()
+        started = time.perf_counter()
+        started_monotonic = time.monotonic()
+        outcome = "ok"
+        try:
+            return await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            outcome = f"error: {e}"
+            raise
+        finally:
+            wall = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+            stacks = sampler.stop() if sampler is not None else None
+            _phases.reset(token)
+            self.active = False
+            try:
+                self._write(tool, started_at, wall, phases, outcome, profiler, stacks, started_monotonic)
+            except OSError as e:
+                logger.error(f"Failed to write profile artifacts to {self.output_dir}: {e}")
+
+    def _write(self, tool, started_at, wall, phases, outcome, profiler, stacks, started_monotonic) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.fromtimestamp(started_at, tz=timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+        base = os.path.join(self.output_dir, f"{stamp}-{tool}")
+        report = {
+            "tool": tool,
+            "started": datetime.fromtimestamp(started_at, tz=timezone.utc).isoformat().replace("+00:00", "Z"),
+            "outcome": outcome,
+            "mode": self.mode,
+            "wall_ms": round(wall * 1000, 1),
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in sorted(phases.items())},
+        }
+        if self.lag_monitor is not None:
+            report["loop_lag_max_ms"] = round(self.lag_monitor.max_since(started_monotonic) * 1000, 1)
+
+        if profiler is not None:
+            import pstats
+            report["profile"] = f"{base}.prof"
+            profiler.dump_stats(report["profile"])
+            entries = pstats.Stats(profiler).stats.items()
+            report["top_cumulative"] = [
+                {"function": f"{os.path.basename(file)}:{line}({name})", "calls": calls, "cumulative_ms": round(cumulative * 1000, 1)}
+                for (file, line, name), (_, calls, _, cumulative, _) in sorted(entries, key=lambda entry: entry[1][3], reverse=True)[:20]
+            ]
+        else:
+            report["profile"] = f"{base}.folded"
+            with open(report["profile"], "w", encoding="utf-8") as folded:
+                folded.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+            report["samples"] = sum(stacks.values())
+
+        with open(f"{base}.json", "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+        self.reports.append(report)
+        logger.info(f"Profiled {tool} ({outcome}): {report['wall_ms']} ms, phases {report['phases_ms']}, artifacts {base}.*")
@@ -0,0 +1,87 @@
+"""
+Session export - Writes session records to compressed NDJSON or CSV files, with a checkpoint for resuming.
+
+Every batch of sessions is written as its own gzip member followed by an atomic checkpoint update,
+so the file is a valid (multi-member) gzip stream at every checkpoint. Resuming truncates the file
+to the last checkpointed offset and continues from the saved SDK position.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+
+FORMATS = {"ndjson": ".ndjson.gz", "csv": ".csv.gz"}
+
+
+class SessionExportWriter:
+    """Appends session batches to an export file and tracks the resume checkpoint next to it."""
+
+    def __init__(self, path: str, query: dict, columns: list[str] | None = None):
+        self.path = path
+        self.checkpoint_path = f"{path}.checkpoint.json"
+        self.query = query
+        self.columns = columns
+        self.state = self._initial_state()
+
+    def _initial_state(self) -> dict:
+        return {"query": self.query, "time_filter": None, "offset": 0, "rows": 0, "id1": None, "pending": None, "complete": False}
+
+    def load_checkpoint(self) -> bool:
+        """Restores the checkpoint if one exists for the same query. Returns True when resuming."""
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as checkpoint:
+                state = json.load(checkpoint)
+        except (OSError, ValueError):
+            return False
+        if state.get("query") != self.query or not os.path.exists(self.path):
+            return False
+        self.state = state
+        return True
+
+    def reset(self) -> None:
+        """Discards any previous export and checkpoint for this path, including a checkpoint already loaded."""
+        for path in (self.path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.state = self._initial_state()
+
+    def _encode(self, sessions: list[dict]) -> bytes:
+        if self.columns is None:
+            return "".join(json.dumps(session, separators=(",", ":"), default=str) + "\n" for session in sessions).encode()
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if self.state["offset"] == 0 and self.state["rows"] == 0:
+            writer.writerow(self.columns)
+        for session in sessions:
+            row = []
+            for column in self.columns:
+                value = session.get(column, "")
+                row.append("|".join(map(str, value)) if isinstance(value, list) else value)
+            writer.writerow(row)
+        return buffer.getvalue().encode()
+
+    def write_batch(self, sessions: list[dict], next_id1: int | None, pending: dict | None) -> None:
+        """Writes one batch as a gzip member and checkpoints the position to resume from (blocking; run in a thread)."""
+        data = self._encode(sessions) if sessions else b""
+        with open(self.path, "ab") as raw:
+            raw.truncate(self.state["offset"])
+            raw.seek(self.state["offset"])
+            if data:
+                raw.write(gzip.compress(data, compresslevel=6))
+            raw.flush()
+            os.fsync(raw.fileno())
+            offset = raw.tell()
+
+        self.state.update(
+            offset=offset,
+            rows=self.state["rows"] + len(sessions),
+            id1=next_id1,
+            pending=pending,
+            complete=next_id1 is None,
+        )
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as checkpoint:
+            json.dump(self.state, checkpoint, default=str)
+        os.replace(tmp_path, self.checkpoint_path)
@@ -0,0 +1,188 @@
+"""
+Session summary - Condenses a stream of session records into an overview that fits an output size budget:
+per-field coverage, distinct counts and top values, numeric ranges, the time span and a small uniform sample of raw sessions.
+
+Sessions are read once. Top values are counted exactly up to `exact_values` distinct values per field; beyond that the
+least frequent half is pruned (counts of the surviving values stay lower bounds) and distinct counts come from a
+HyperLogLog, so memory stays bounded however many sessions are streamed.
+"""
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+from sketches import HyperLogLog, KLLSketch
+
+# Meta keys summarized as numeric ranges (bytes/packets) instead of top values
+NUMERIC_KEYS = ("size", "payload", "payload.req", "payload.res", "packets")
+# Meta keys left out of the per-field table: the session id is unique and time is shown as the time span
+SKIPPED_KEYS = ("sessionid", "time")
+
+
+class _FieldStats:
+    __slots__ = ("sessions", "values", "distinct", "pruned")
+
+    def __init__(self):
+        self.sessions = 0
+        self.values = Counter()
+        self.distinct = HyperLogLog(precision=12)
+        self.pruned = False
+
+
+class _NumericStats:
+    __slots__ = ("minimum", "maximum", "total", "quantiles")
+
+    def __init__(self):
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+        self.total = 0.0
+        self.quantiles = KLLSketch(seed=0)
+
+
+def _short(value, width: int = 60) -> str:
+    text = str(value).replace("|", "/").replace("\n", " ")
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+def _number(value: float) -> str:
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+
+class SessionSummary:
+    """Accumulates session records ({'sessionid': ..., meta_key: value | [values]}) and renders a bounded summary."""
+
+    def __init__(self, exact_values: int = 10000, sample_size: int = 5, top_values: int = 5, seed: int | None = None):
+        self.exact_values = exact_values
+        self.sample_size = sample_size
+        self.top_values = top_values
+        self.sessions = 0
+        self.fields: dict[str, _FieldStats] = {}
+        self.numeric: dict[str, _NumericStats] = {}
+        self.first_time = None
+        self.last_time = None
+        self.sample: list[dict] = []
+        self._random = random.Random(seed)
+
+    def add(self, session: dict, timestamp: float | None = None) -> None:
+        """Adds one session; timestamp is its start time in epoch seconds, if known."""
+        self.sessions += 1
+        if timestamp is not None:
+            self.first_time = timestamp if self.first_time is None else min(self.first_time, timestamp)
+            self.last_time = timestamp if self.last_time is None else max(self.last_time, timestamp)
+
+        for key, value in session.items():
+            if key in SKIPPED_KEYS:
+                continue
+            values = value if isinstance(value, list) else [value]
+            if key in NUMERIC_KEYS:
+                stats = self.numeric.get(key) or self.numeric.setdefault(key, _NumericStats())
+                for item in values:
+                    try:
+                        number = float(item)
+                    except (TypeError, ValueError):
+                        continue
+                    stats.minimum = min(stats.minimum, number)
+                    stats.maximum = max(stats.maximum, number)
+                    stats.total += number
+                    stats.quantiles.add(number)
+                continue
+
+            stats = self.fields.get(key) or self.fields.setdefault(key, _FieldStats())
+            stats.sessions += 1
+            for item in values:
+                stats.values[item] += 1
+                stats.distinct.add(item)
+            if len(stats.values) > self.exact_values:
+                stats.values = Counter(dict(stats.values.most_common(self.exact_values // 2)))
+                stats.pruned = True
+
+        # Reservoir sampling (algorithm R): every session has the same chance to be in the sample
+        if len(self.sample) < self.sample_size:
+            self.sample.append(session)
+        else:
+            index = self._random.randrange(self.sessions)
+            if index < self.sample_size:
+                self.sample[index] = session
+
+    def render(self, max_chars: int, annotate=None) -> str:
+        """Renders the summary as markdown within max_chars. Sections are added in priority order (overview, numeric
+        ranges, fields by coverage, sample sessions) and whatever does not fit is counted as omitted.
+        annotate(meta_key, value) may return a suffix for a top value (e.g. an IOC match). The result, including the note
+        on omitted sections, is never longer than max_chars."""
+        annotate = annotate or (lambda key, value: "")
+        parts: list[str] = []
+        used = 0
+
+        def omitted_note(meta_keys: int, samples: int) -> str:
+            omitted = []
+            if meta_keys:
+                omitted.append(f"{meta_keys} meta keys")
+            if samples:
+                omitted.append(f"{samples} sample sessions")
+            return f"\n*Omitted to fit the output size budget: {', '.join(omitted)}.*" if omitted else ""
+
+        by_coverage = sorted(self.fields.items(), key=lambda item: (-item[1].sessions, item[0]))
+        # Room is kept for the longest note on omitted sections (everything omitted)
+        limit = max_chars - len(omitted_note(len(by_coverage), len(self.sample)))
+
+        def fits(text: str) -> bool:
+            nonlocal used
+            if used + len(text) > limit:
+                return False
+            parts.append(text)
+            used += len(text)
+            return True
+
+        def drop_last() -> None:
+            # Takes back a section heading none of whose rows fit
+            nonlocal used
+            used -= len(parts.pop())
+
+        overview = f"**Sessions Summarized**: {self.sessions:,}\n"
+        if self.first_time is not None:
+            first = datetime.fromtimestamp(self.first_time, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+            last = datetime.fromtimestamp(self.last_time, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+            overview += f"**Time Span**: {first} - {last} ({_number((self.last_time - self.first_time) / 60)} min)\n"
+        fits(overview)
+
+        if self.numeric:
+            section = "\n| Numeric Key | Min | p50 | p90 | Max | Total |\n|-------|-------|-------|-------|-------|-------|\n"
+            for key, stats in sorted(self.numeric.items()):
+                if stats.quantiles.n:
+                    section += (
+                        f"| {key} | {_number(stats.minimum)} | {_number(stats.quantiles.quantile(0.5))} | "
+                        f"{_number(stats.quantiles.quantile(0.9))} | {_number(stats.maximum)} | {_number(stats.total)} |\n"
+                    )
+            fits(section)
+
+        shown = 0
+        if by_coverage and fits("\n| Meta Key | Sessions | Distinct | Top Values (count) |\n|-------|-------|-------|-------|\n"):
+            for key, stats in by_coverage:
+                distinct = stats.distinct.estimate() if stats.pruned else len(stats.values)
+                top = ", ".join(
+                    f"{_short(value)}{annotate(key, value)} ({count:,}{'+' if stats.pruned else ''})"
+                    for value, count in stats.values.most_common(self.top_values)
+                )
+                row = f"| {key} | {stats.sessions / self.sessions:.0%} | {'~' if stats.pruned else ''}{distinct:,} | {top} |\n"
+                if not fits(row):
+                    break
+                shown += 1
+            if not shown:
+                drop_last()
+
+        samples_shown = 0
+        if self.sample and fits("\n**Sample Sessions**:\n"):
+            for session in self.sample:
+                details = ", ".join(
+                    f"{key}={_short('|'.join(map(str, value)) if isinstance(value, list) else value, 40)}"
+                    for key, value in session.items() if key != 'sessionid'
+                )
+                if not fits(f"- **Session {session['sessionid']}**: {details}\n"):
+                    break
+                samples_shown += 1
+            if not samples_shown:
+                drop_last()
+
+        note = omitted_note(len(by_coverage) - shown, len(self.sample) - samples_shown)
+        if note and used + len(note) <= max_chars:
+            parts.append(note)
+        return "".join(parts)
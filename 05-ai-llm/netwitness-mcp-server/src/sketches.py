@@ -0,0 +1,128 @@
+"""
+Probabilistic sketches - Fixed-memory summaries used when a meta key has too many values to hold exactly.
+"""
+import hashlib
+import math
+import random
+
+
+def hash64(value) -> int:
+    """Stable 64-bit hash of a meta value (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "little")
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false-positive rate, sized for an expected capacity."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from two 32-bit halves of one 64-bit hash
+        h = hash64(value)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value) -> None:
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**precision bytes (about 0.8% standard error at the default precision of 14)."""
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value) -> None:
+        h = hash64(value)
+        index = h >> (64 - self.precision)
+        remainder = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.m * math.log(self.m / zeros)
+        return round(estimate)
+
+
+class KLLSketch:
+    """Streaming quantiles of numeric values with O(k log n) memory (KLL compactor hierarchy)."""
+
+    def __init__(self, k: int = 200, seed: int | None = None):
+        self.k = k
+        self.n = 0
+        self.compactors: list[list] = []
+        self.size = 0
+        self.max_size = 0
+        self._random = random.Random(seed)
+        self._grow()
+
+    def _capacity(self, height: int) -> int:
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def _grow(self) -> None:
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(height) for height in range(len(self.compactors)))
+
+    def _compress(self) -> None:
+        for height in range(len(self.compactors)):
+            if len(self.compactors[height]) >= self._capacity(height):
+                if height + 1 >= len(self.compactors):
+                    self._grow()
+                # Keep every other item of the sorted compactor, each now standing for twice the weight
+                items = sorted(self.compactors[height])
+                self.compactors[height + 1].extend(items[self._random.getrandbits(1)::2])
+                self.compactors[height] = []
+                self.size = sum(len(compactor) for compactor in self.compactors)
+                if self.size < self.max_size:
+                    break
+
+    def add(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self.size += 1
+        self.n += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _weighted(self) -> list[tuple[float, int]]:
+        return sorted((item, 1 << height) for height, compactor in enumerate(self.compactors) for item in compactor)
+
+    def quantile(self, q: float) -> float | None:
+        """Returns the value at quantile q (0..1), or None if the sketch is empty."""
+        weighted = self._weighted()
+        if not weighted:
+            return None
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        cumulative = 0
+        for item, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return item
+        return weighted[-1][0]
+
+    def rank(self, value: float) -> float:
+        """Returns the estimated fraction of added values that are <= value."""
+        weighted = self._weighted()
+        total = sum(weight for _, weight in weighted)
+        return sum(weight for item, weight in weighted if item <= value) / total if total else 0.0
@@ -0,0 +1,166 @@
+"""
+Tests of the ESA window semantics replayed by simulate_esa_rule: groupwin / time_length_batch / unique /
+having count(*) >= threshold / output first every / reclaim_group_aged.
+
+Run from the project directory:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from esa_simulator import GroupedWindowSimulator  # noqa: E402
+
+
+def replay(simulator: GroupedWindowSimulator, events: list[tuple]) -> list[dict]:
+    """Feeds (timestamp, group, values) events and finishes the stream. Returns all firings."""
+    firings = []
+    for timestamp, group, values in events:
+        firings += simulator.process(timestamp, group, values)
+    return firings + simulator.finish()
+
+
+class BatchTest(unittest.TestCase):
+    def test_batch_closed_by_count(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=5, threshold=3)
+        firings = []
+        for i in range(5):
+            firings += simulator.process(100 + i, "10.0.0.1", [f"user{i}"])
+        # The fifth event fills the batch, which is evaluated right away, before its window elapsed
+        self.assertEqual(len(firings), 1)
+        self.assertEqual(firings[0]["time"], 104)
+        self.assertEqual(firings[0]["events"], 5)
+        self.assertEqual(firings[0]["distinct"], 5)
+
+    def test_batch_closed_by_time(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=3)
+        for i in range(3):
+            self.assertEqual(simulator.process(100 + i, "10.0.0.1", [f"user{i}"]), [])
+        # The next event of the group is past the window: the batch closes at its window end, then a new one opens
+        firings = simulator.process(200, "10.0.0.1", ["user9"])
+        self.assertEqual([(f["time"], f["events"], f["distinct"]) for f in firings], [(160, 3, 3)])
+        self.assertEqual(simulator.finish(), [])
+        self.assertEqual(simulator.stats["batches"], 2)
+
+    def test_open_batches_are_evaluated_at_finish(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=2)
+        firings = replay(simulator, [(100, "a", ["x"]), (101, "a", ["y"]), (102, "b", ["x"])])
+        self.assertEqual([(f["group"], f["time"]) for f in firings], [("a", 160)])
+
+    def test_groups_have_separate_batches(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=3)
+        events = [(100 + i, f"10.0.0.{i % 2}", [f"user{i}"]) for i in range(4)]
+        # Four distinct values in total, but only two per group
+        self.assertEqual(replay(simulator, events), [])
+
+
+class ThresholdTest(unittest.TestCase):
+    def distinct_firings(self, values: list[str]) -> list[dict]:
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=3)
+        return replay(simulator, [(100 + i, "10.0.0.1", [value]) for i, value in enumerate(values)])
+
+    def test_fires_at_exactly_threshold(self):
+        firings = self.distinct_firings(["a", "b", "c"])
+        self.assertEqual(len(firings), 1)
+        self.assertEqual(firings[0]["distinct"], 3)
+        self.assertEqual(firings[0]["sample"], ["a", "b", "c"])
+
+    def test_below_threshold_does_not_fire(self):
+        self.assertEqual(self.distinct_firings(["a", "b"]), [])
+
+    def test_repeated_values_count_once(self):
+        # std:unique keeps one event per value: five events, but only two distinct values
+        self.assertEqual(self.distinct_firings(["a", "b", "a", "b", "a"]), [])
+
+    def test_multi_valued_event(self):
+        # A session with several values of the distinct field contributes all of them
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=3)
+        self.assertEqual(len(replay(simulator, [(100, "10.0.0.1", ["a", "b", "c"])])), 1)
+
+
+class OutputFirstTest(unittest.TestCase):
+    def qualifying_batch(self, start: float) -> list[tuple]:
+        return [(start + i, "10.0.0.1", [f"user{i}"]) for i in range(3)]
+
+    def test_firings_suppressed_within_output_period(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=3, threshold=3, suppress_seconds=1800)
+        events = self.qualifying_batch(0) + self.qualifying_batch(600) + self.qualifying_batch(1799)
+        firings = replay(simulator, events)
+        self.assertEqual([f["time"] for f in firings], [2])
+        self.assertEqual(simulator.stats["suppressed"], 2)
+
+    def test_fires_again_after_output_period(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=3, threshold=3, suppress_seconds=1800)
+        firings = replay(simulator, self.qualifying_batch(0) + self.qualifying_batch(1802))
+        self.assertEqual([f["time"] for f in firings], [2, 1804])
+
+    def test_suppression_is_per_group(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=3, threshold=3, suppress_seconds=1800)
+        events = self.qualifying_batch(0) + [(10 + i, "10.0.0.2", [f"user{i}"]) for i in range(3)]
+        self.assertEqual([f["group"] for f in replay(simulator, events)], ["10.0.0.1", "10.0.0.2"])
+
+
+class ReclaimTest(unittest.TestCase):
+    def test_idle_group_is_reclaimed(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=10, reclaim_aged_seconds=120)
+        simulator.process(0, "10.0.0.1", ["a"])
+        simulator.process(100, "10.0.0.2", ["a"])
+        self.assertIn("10.0.0.1", simulator.groups)
+        simulator.process(121, "10.0.0.2", ["b"])
+        self.assertNotIn("10.0.0.1", simulator.groups)
+        self.assertIn("10.0.0.2", simulator.groups)
+        self.assertEqual(simulator.stats["groups_reclaimed"], 1)
+
+    def test_reclaimed_group_batch_is_evaluated(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=3, reclaim_aged_seconds=120)
+        for i in range(3):
+            simulator.process(i, "10.0.0.1", [f"user{i}"])
+        # Reclaiming the idle group closes its open batch at the end of its window
+        firings = simulator.process(500, "10.0.0.2", ["x"])
+        self.assertEqual([(f["group"], f["time"]) for f in firings], [("10.0.0.1", 60)])
+        self.assertNotIn("10.0.0.1", simulator.groups)
+
+    def test_output_limit_survives_reclaim(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=3, threshold=3, suppress_seconds=1800,
+                                           reclaim_aged_seconds=120)
+        events = [(i, "10.0.0.1", [f"user{i}"]) for i in range(3)]
+        events += [(300, "10.0.0.2", ["x"])]
+        events += [(600 + i, "10.0.0.1", [f"user{i}"]) for i in range(3)]
+        firings = replay(simulator, events)
+        self.assertEqual([f["time"] for f in firings], [2])
+        # 10.0.0.1 is reclaimed at t=300, 10.0.0.2 at t=600
+        self.assertEqual(simulator.stats["groups_reclaimed"], 2)
+        self.assertEqual(simulator.stats["suppressed"], 1)
+
+    def test_max_groups_bounds_memory(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=10, max_groups=3)
+        for i in range(10):
+            simulator.process(i, f"10.0.0.{i}", ["a"])
+            self.assertLessEqual(len(simulator.groups), 3)
+        self.assertEqual(simulator.stats["groups_dropped"], 7)
+
+
+class LateEventTest(unittest.TestCase):
+    def test_late_event_is_evaluated_at_current_clock(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=2)
+        firings = simulator.process(0, "10.0.0.1", ["a"])
+        firings += simulator.process(1, "10.0.0.1", ["b"])
+        firings += simulator.process(100, "10.0.0.2", ["x"])
+        # Arrives out of order at t=50 but is treated as t=100: the group's batch (0-60) has closed already
+        firings += simulator.process(50, "10.0.0.1", ["c"])
+        self.assertEqual(simulator.stats["late_events"], 1)
+        self.assertEqual([(f["group"], f["time"], f["distinct"]) for f in firings], [("10.0.0.1", 60, 2)])
+        self.assertEqual(simulator.groups["10.0.0.1"].batch_start, 100)
+
+    def test_clock_never_moves_backwards(self):
+        simulator = GroupedWindowSimulator(window_seconds=60, batch_size=20, threshold=2)
+        simulator.process(100, "a", ["x"])
+        simulator.process(40, "b", ["y"])
+        self.assertEqual(simulator.clock, 100)
+        self.assertEqual(simulator.groups["b"].last_seen, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+"""
+Tests of the offline IOC index: interval sweep of overlapping feeds, IPv4/IPv6 range edges, domain matching and reloads.
+
+Run from the project directory:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import ioc_index  # noqa: E402
+from ioc_index import IOCIndex, _disjoint_intervals  # noqa: E402
+
+
+class DisjointIntervalsTest(unittest.TestCase):
+    def test_overlapping_intervals_are_split(self):
+        segments = _disjoint_intervals([(0, 99, 0), (50, 149, 1), (60, 69, 2)])
+        self.assertEqual(segments, [
+            (0, 49, frozenset({0})),
+            (50, 59, frozenset({0, 1})),
+            (60, 69, frozenset({0, 1, 2})),
+            (70, 99, frozenset({0, 1})),
+            (100, 149, frozenset({1})),
+        ])
+
+    def test_adjacent_intervals_of_the_same_feeds_are_merged(self):
+        self.assertEqual(_disjoint_intervals([(0, 9, 0), (10, 19, 0)]), [(0, 19, frozenset({0}))])
+
+    def test_duplicates_and_gaps(self):
+        segments = _disjoint_intervals([(5, 5, 0), (5, 5, 0), (20, 30, 1)])
+        self.assertEqual(segments, [(5, 5, frozenset({0})), (20, 30, frozenset({1}))])
+
+
+class IOCIndexTestCase(unittest.TestCase):
+    """Writes feed files to a temporary feed directory and loads the index from it."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.feed_dir = os.path.join(directory.name, "feeds")
+        os.mkdir(self.feed_dir)
+        self.index_path = os.path.join(directory.name, "ioc.bin")
+
+    def write_feed(self, name: str, lines: list[str]) -> None:
+        path = os.path.join(self.feed_dir, name)
+        with open(path, "w", encoding="utf-8") as feed:
+            feed.write("\n".join(lines) + "\n")
+        # Make every write visible to the fingerprint, even within the file system's timestamp resolution
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def load(self) -> IOCIndex:
+        index = IOCIndex.load(self.feed_dir, self.index_path)
+        self.addCleanup(index.close)
+        return index
+
+
+class IPMatchTest(IOCIndexTestCase):
+    def test_overlapping_cidrs_from_several_feeds(self):
+        self.write_feed("botnet.txt", ["10.0.0.0/8", "# comment", "192.0.2.1"])
+        self.write_feed("scanners.csv", ["10.1.0.0/16,seen 2024", "\"192.0.2.1\",dup"])
+        self.write_feed("tor.txt", ["10.1.2.3  # exit node"])
+        index = self.load()
+        self.assertEqual(index.match("10.200.0.1"), "botnet")
+        self.assertEqual(index.match("10.1.9.9"), "botnet, scanners")
+        self.assertEqual(index.match("10.1.2.3"), "botnet, scanners, tor")
+        self.assertEqual(index.match("192.0.2.1"), "botnet, scanners")
+        self.assertIsNone(index.match("11.0.0.0"))
+
+    def test_ipv4_range_edges(self):
+        self.write_feed("feed.txt", ["198.51.100.0/24", "0.0.0.0/32", "255.255.255.255"])
+        index = self.load()
+        self.assertIsNone(index.match("198.51.99.255"))
+        self.assertEqual(index.match("198.51.100.0"), "feed")
+        self.assertEqual(index.match("198.51.100.255"), "feed")
+        self.assertIsNone(index.match("198.51.101.0"))
+        self.assertEqual(index.match("0.0.0.0"), "feed")
+        self.assertIsNone(index.match("0.0.0.1"))
+        self.assertEqual(index.match("255.255.255.255"), "feed")
+
+    def test_host_bits_of_a_cidr_are_ignored(self):
+        self.write_feed("feed.txt", ["203.0.113.77/28"])
+        index = self.load()
+        self.assertEqual(index.match("203.0.113.64"), "feed")
+        self.assertEqual(index.match("203.0.113.79"), "feed")
+        self.assertIsNone(index.match("203.0.113.80"))
+
+    def test_ipv6_range_edges(self):
+        self.write_feed("v6.txt", ["2001:db8::/32", "2001:db8:1::/48", "::1", "ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff"])
+        self.write_feed("other.txt", ["2001:db8:1:2::/64"])
+        index = self.load()
+        self.assertIsNone(index.match("2001:db7:ffff:ffff:ffff:ffff:ffff:ffff"))
+        self.assertEqual(index.match("2001:db8::"), "v6")
+        self.assertEqual(index.match("2001:db8:ffff:ffff:ffff:ffff:ffff:ffff"), "v6")
+        self.assertIsNone(index.match("2001:db9::"))
+        self.assertEqual(index.match("2001:db8:1:2::5"), "other, v6")
+        self.assertEqual(index.match("2001:db8:1:3::"), "v6")
+        self.assertEqual(index.match("::1"), "v6")
+        self.assertIsNone(index.match("::2"))
+        self.assertEqual(index.match("ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff"), "v6")
+
+    def test_ipv4_and_ipv6_are_separate(self):
+        self.write_feed("feed.txt", ["10.0.0.1"])
+        index = self.load()
+        self.assertIsNone(index.match("::a00:1"))
+
+
+class DomainMatchTest(IOCIndexTestCase):
+    def test_parent_domains_match(self):
+        self.write_feed("phishing.txt", ["evil.example.com", "*.Bad.Example.ORG.", "tracker.net"])
+        index = self.load()
+        self.assertEqual(index.match("evil.example.com"), "phishing")
+        self.assertEqual(index.match("login.evil.example.com"), "phishing")
+        self.assertEqual(index.match("a.b.c.evil.example.com"), "phishing")
+        self.assertIsNone(index.match("example.com"))
+        self.assertIsNone(index.match("notevil.example.com"))
+
+    def test_wildcard_and_case_are_normalised(self):
+        self.write_feed("phishing.txt", ["*.Bad.Example.ORG."])
+        index = self.load()
+        self.assertEqual(index.match("bad.example.org"), "phishing")
+        self.assertEqual(index.match("www.BAD.example.org."), "phishing")
+        self.assertIsNone(index.match("example.org"))
+
+    def test_most_specific_listing_wins(self):
+        self.write_feed("broad.txt", ["example.com"])
+        self.write_feed("narrow.txt", ["cdn.example.com"])
+        index = self.load()
+        self.assertEqual(index.match("x.cdn.example.com"), "narrow")
+        self.assertEqual(index.match("www.example.com"), "broad")
+
+    def test_invalid_lines_are_skipped(self):
+        self.write_feed("feed.txt", ["localhost", "10.0.0.0/33", "user@example.com", "example.com/path", "good.example.net"])
+        stats = ioc_index.compile_index(ioc_index.feed_files(self.feed_dir), self.index_path, b"\0" * 32)
+        self.assertEqual(stats["skipped_lines"], 4)
+        self.assertEqual(stats["domains"], 1)
+
+
+class ReloadTest(IOCIndexTestCase):
+    def test_unchanged_feeds_are_remapped(self):
+        self.write_feed("feed.txt", ["10.0.0.1"])
+        self.load()
+        with mock.patch.object(ioc_index, "compile_index", wraps=ioc_index.compile_index) as compile_index:
+            index = self.load()
+        compile_index.assert_not_called()
+        self.assertEqual(index.match("10.0.0.1"), "feed")
+
+    def test_edited_feed_is_recompiled(self):
+        self.write_feed("feed.txt", ["10.0.0.1"])
+        first = self.load()
+        self.write_feed("feed.txt", ["10.0.0.2", "changed.example.com"])
+        with mock.patch.object(ioc_index, "compile_index", wraps=ioc_index.compile_index) as compile_index:
+            index = self.load()
+        compile_index.assert_called_once()
+        self.assertNotEqual(index.fingerprint, first.fingerprint)
+        self.assertIsNone(index.match("10.0.0.1"))
+        self.assertEqual(index.match("10.0.0.2"), "feed")
+        self.assertEqual(index.match("changed.example.com"), "feed")
+        # The previous mapping stays valid until it is closed
+        self.assertEqual(first.match("10.0.0.1"), "feed")
+
+    def test_added_and_removed_feeds_are_recompiled(self):
+        self.write_feed("a.txt", ["10.0.0.1"])
+        self.load()
+        self.write_feed("b.txt", ["10.0.0.1"])
+        self.assertEqual(self.load().match("10.0.0.1"), "a, b")
+        os.remove(os.path.join(self.feed_dir, "a.txt"))
+        self.assertEqual(self.load().match("10.0.0.1"), "b")
+
+    def test_corrupt_index_is_rebuilt(self):
+        self.write_feed("feed.txt", ["10.0.0.1"])
+        with open(self.index_path, "wb") as index_file:
+            index_file.write(b"not an index")
+        self.assertEqual(self.load().match("10.0.0.1"), "feed")
+        self.assertEqual([name for name in os.listdir(os.path.dirname(self.index_path)) if name.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Boundary tests for the URL length limit of pivot_alerts_to_sessions batches.
+
+Run from the project directory with the requirements installed:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("NETWITNESS_API_URL", "https://concentrator.example.com:50105/rest")
+
+import netwitness_mcp_server as server  # noqa: E402
+
+SELECT_PART = "select ip.src,ip.dst,alias.host"
+TIME_FILTER = 'time="2026-Oct-19 10:00:00"-"2026-Oct-19 11:00:00"'
+SIZE = 1000
+INDICATORS = {
+    "ip.src": [f"10.0.{i // 256}.{i % 256}" for i in range(40)],
+    "ip.dst": [f"192.168.1.{i}" for i in range(40)],
+    "alias.host": [f"host-{i}.o'brien.example.com" for i in range(40)],
+}
+
+
+def batch_urls(max_length: int) -> list[str]:
+    """The URLs pivot_alerts_to_sessions requests for INDICATORS under max_length."""
+    fixed_length = len(server.sdk_url(server.session_page_params(server.pivot_query(SELECT_PART, "", TIME_FILTER), SIZE)))
+    return [
+        server.sdk_url(server.session_page_params(server.pivot_query(SELECT_PART, where, TIME_FILTER), SIZE))
+        for where in server.batch_where_clauses(INDICATORS, fixed_length, max_length)
+    ]
+
+
+class PivotBatchLengthTest(unittest.TestCase):
+    def test_single_batch_exactly_at_limit(self):
+        url = batch_urls(10 ** 6)[0]
+        self.assertEqual(batch_urls(len(url)), [url])
+
+    def test_one_byte_under_limit_splits(self):
+        limit = len(batch_urls(10 ** 6)[0]) - 1
+        urls = batch_urls(limit)
+        self.assertGreater(len(urls), 1)
+        self.assertTrue(all(len(url) <= limit for url in urls))
+
+    def test_urls_never_exceed_limit(self):
+        for limit in range(1000, 4001):
+            urls = batch_urls(limit)
+            self.assertLessEqual(max(len(url) for url in urls), limit, f"limit {limit}")
+
+
+if __name__ == "__main__":
+    unittest.main()
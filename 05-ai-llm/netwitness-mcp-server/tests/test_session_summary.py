@@ -0,0 +1,106 @@
+"""
+Tests that session summaries (query_sessions output_mode="summary") stay within their output size budget.
+
+Run from the project directory with the requirements installed:
+    python -m unittest discover tests
+"""
+import logging
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("NETWITNESS_API_URL", "https://concentrator.example.com:50105/rest")
+
+import netwitness_mcp_server as server  # noqa: E402
+from session_summary import SessionSummary  # noqa: E402
+
+# Every mock upstream request is logged at INFO
+logging.disable(logging.INFO)
+
+
+def sample_sessions(count: int, seed: int = 1) -> list[dict]:
+    generator = random.Random(seed)
+    sessions = []
+    for sid in range(1, count + 1):
+        session = {
+            "sessionid": sid,
+            "time": 1700000000 + sid * 3,
+            "ip.src": f"10.0.0.{generator.randint(1, 40)}",
+            "ip.dst": f"8.8.{generator.randint(0, 3)}.{generator.randint(1, 9)}",
+            "service": generator.choice([53, 80, 443]),
+            "alias.host": f"host{int(generator.paretovariate(1.2))}.example.com",
+            "size": generator.randint(60, 100000),
+        }
+        if sid % 3 == 0:
+            session["client"] = "curl/8.0"
+        sessions.append(session)
+    return sessions
+
+
+def meta_fields(sessions: list[dict]) -> list[dict]:
+    """Flattens sessions into SDK msg=query meta fields, numbered by meta id from 1."""
+    fields = []
+    for session in sessions:
+        for key, value in session.items():
+            if key != "sessionid":
+                fields.append({"id1": len(fields) + 1, "type": key, "value": value, "group": session["sessionid"]})
+    return fields
+
+
+class RenderBudgetTest(unittest.TestCase):
+    def test_render_never_exceeds_max_chars(self):
+        summary = SessionSummary(sample_size=5, seed=1)
+        for session in sample_sessions(500):
+            summary.add(dict(session, **{f"extra{j}": j for j in range(session["sessionid"] % 30)}), session["time"])
+        for max_chars in range(0, 5000, 3):
+            self.assertLessEqual(len(summary.render(max_chars)), max_chars, f"max_chars {max_chars}")
+
+    def test_omitted_sections_are_noted(self):
+        summary = SessionSummary(sample_size=5, seed=1)
+        for session in sample_sessions(200):
+            summary.add(session, session["time"])
+        rendered = summary.render(400)
+        self.assertIn("Omitted to fit the output size budget", rendered)
+        self.assertNotIn("**Sample Sessions**", rendered)
+
+
+class QuerySessionsSummaryBudgetTest(unittest.IsolatedAsyncioTestCase):
+    FIELDS = meta_fields(sample_sessions(3000))
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        id1 = int(params.get("id1", 1))
+        page = self.FIELDS[id1 - 1:id1 - 1 + int(params["size"])]
+        return httpx.Response(200, json={"results": {"id1": id1, "id2": id1 - 1 + len(page), "fields": page}})
+
+    def setUp(self):
+        patches = [
+            mock.patch.multiple(server, API_USERNAME="admin", API_PASSWORD="secret"),
+            mock.patch.object(server, "upstream_client", lambda **kwargs: httpx.AsyncClient(transport=httpx.MockTransport(self.handle), **kwargs)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_long_filter_within_budget(self):
+        where_clause = " || ".join(f"ip.src=10.0.{i}.1" for i in range(40))
+        self.assertGreater(len(where_clause), 500)
+        for max_output_chars in (500, 800, 2000, 6000):
+            # max_results below the number of sessions also adds the "first N sessions" notice to the header
+            result = await server.query_sessions(where_clause, "", "1h", 1000, output_mode="summary", max_output_chars=max_output_chars)
+            self.assertIn("**Sessions Summarized**", result)
+            self.assertIn("Summary of the first 1,000 matching sessions", result)
+            self.assertLessEqual(len(result), max_output_chars, f"max_output_chars {max_output_chars}")
+
+    async def test_too_small_budget_is_rejected(self):
+        result = await server.query_sessions("", "", "1h", 1000, output_mode="summary", max_output_chars=100)
+        self.assertTrue(result.startswith("❌"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Accuracy tests of the fixed-memory sketches against exact values, with seeded inputs.
+
+Run from the project directory:
+    python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from sketches import BloomFilter, HyperLogLog, KLLSketch  # noqa: E402
+
+
+class HyperLogLogTest(unittest.TestCase):
+    def test_estimate_error(self):
+        # Standard error is 1.04 / sqrt(2**14), about 0.8%; allow four standard errors
+        for distinct in (1000, 10000, 100000, 300000):
+            hll = HyperLogLog(precision=14)
+            for i in range(distinct):
+                hll.add(f"host{i}.example.com")
+            error = abs(hll.estimate() - distinct) / distinct
+            self.assertLess(error, 0.033, f"{distinct} distinct values estimated as {hll.estimate()}")
+
+    def test_small_cardinalities_are_near_exact(self):
+        hll = HyperLogLog(precision=14)
+        for i in range(100):
+            hll.add(f"10.0.0.{i}")
+        self.assertLessEqual(abs(hll.estimate() - 100), 1)
+
+    def test_duplicates_do_not_count(self):
+        hll = HyperLogLog(precision=12)
+        for _ in range(50):
+            for i in range(1000):
+                hll.add(i)
+        self.assertLess(abs(hll.estimate() - 1000) / 1000, 0.065)
+
+    def test_merge_equals_union(self):
+        left, right, union = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+        for i in range(20000):
+            (left if i % 2 else right).add(i)
+            union.add(i)
+        left.merge(right)
+        self.assertEqual(left.estimate(), union.estimate())
+
+    def test_empty(self):
+        self.assertEqual(HyperLogLog().estimate(), 0)
+
+
+class KLLSketchTest(unittest.TestCase):
+    def test_quantile_rank_error(self):
+        generator = random.Random(7)
+        values = [generator.lognormvariate(8, 2) for _ in range(100000)]
+        sketch = KLLSketch(k=200, seed=1)
+        for value in values:
+            sketch.add(value)
+        exact = sorted(values)
+        for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+            estimate = sketch.quantile(q)
+            # The rank of the returned value among the exact values, compared with the requested rank
+            rank = sum(1 for value in exact if value <= estimate) / len(exact)
+            self.assertLess(abs(rank - q), 0.02, f"q={q}: returned value has rank {rank:.4f}")
+
+    def test_rank_error(self):
+        generator = random.Random(3)
+        values = [generator.randint(1, 5000) for _ in range(50000)]
+        sketch = KLLSketch(k=200, seed=2)
+        for value in values:
+            sketch.add(value)
+        for probe in (10, 500, 2500, 4900):
+            exact = sum(1 for value in values if value <= probe) / len(values)
+            self.assertLess(abs(sketch.rank(probe) - exact), 0.02, f"rank({probe})")
+
+    def test_memory_is_bounded(self):
+        sketch = KLLSketch(k=200, seed=0)
+        for i in range(200000):
+            sketch.add(i)
+        self.assertEqual(sketch.n, 200000)
+        self.assertLess(sketch.size, 2000)
+
+    def test_small_input_is_exact(self):
+        sketch = KLLSketch(k=200, seed=0)
+        for value in (5, 1, 4, 2, 3):
+            sketch.add(value)
+        self.assertEqual([sketch.quantile(q) for q in (0, 0.2, 0.5, 1)], [1, 1, 3, 5])
+
+    def test_empty(self):
+        sketch = KLLSketch()
+        self.assertIsNone(sketch.quantile(0.5))
+        self.assertEqual(sketch.rank(1), 0.0)
+
+
+class BloomFilterTest(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=20000, error_rate=0.001)
+        members = [f"host{i}.example.com" for i in range(20000)]
+        for member in members:
+            bloom.add(member)
+        self.assertTrue(all(member in bloom for member in members))
+        self.assertEqual(bloom.count, 20000)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=20000, error_rate=0.01)
+        for i in range(20000):
+            bloom.add(f"member{i}")
+        false_positives = sum(f"other{i}" in bloom for i in range(100000))
+        # Three times the configured rate at full capacity
+        self.assertLess(false_positives / 100000, 0.03)
+
+    def test_mixed_value_types(self):
+        bloom = BloomFilter(capacity=100)
+        for value in (443, "443", 3.5, "10.0.0.1"):
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in (443, "443", 3.5, "10.0.0.1")))
+
+
+if __name__ == "__main__":
+    unittest.main()
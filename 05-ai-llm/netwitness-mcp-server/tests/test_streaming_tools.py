@@ -0,0 +1,170 @@
+"""
+Tests that the streaming tools (bounded producer/consumer pipelines) always finish, whichever side fails.
+
+Run from the project directory with the requirements installed:
+    python -m unittest discover tests
+"""
+import asyncio
+import errno
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("NETWITNESS_API_URL", "https://concentrator.example.com:50105/rest")
+
+import netwitness_mcp_server as server  # noqa: E402
+from session_export import SessionExportWriter  # noqa: E402
+
+# Every mock upstream request is logged at INFO
+logging.disable(logging.INFO)
+
+# A call that does not finish within this many seconds is considered hung
+HANG_SECONDS = 5
+
+
+def endless_sessions(request: httpx.Request) -> httpx.Response:
+    """msg=query upstream that never runs out of sessions: every page is full, one meta field per session."""
+    params = request.url.params
+    id1 = int(params.get("id1", 1))
+    size = int(params["size"])
+    fields = [{"id1": i, "type": "ip.src", "value": f"10.0.{i // 256 % 256}.{i % 256}", "group": i} for i in range(id1, id1 + size)]
+    return httpx.Response(200, json={"results": {"id1": id1, "id2": id1 + size - 1, "fields": fields}})
+
+
+def current_window(where: str) -> bool:
+    """True if a where clause filters on a time window ending in the last 30 minutes (diff_metakey_values' current window)."""
+    end = re.search(r'time="[^"]+"-"([^"]+)"', where).group(1)
+    return datetime.strptime(end, "%Y-%b-%d %H:%M:%S").replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) - timedelta(minutes=30)
+
+
+def endless_values(request: httpx.Request) -> httpx.Response:
+    """msg=values upstream that never runs out of values: every page is full."""
+    params = request.url.params
+    last = re.search(r"> '?host(\d+)", params["where"])
+    start = int(last.group(1)) + 1 if last else 0
+    fields = [{"value": f"host{i:08d}", "count": 1 + i % 7} for i in range(start, start + int(params["size"]))]
+    return httpx.Response(200, json={"results": {"fields": fields}})
+
+
+class StreamingToolTestCase(unittest.IsolatedAsyncioTestCase):
+    """Runs the tools against a mock upstream (self.handle) with credentials and a temporary export directory."""
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        return endless_sessions(request)
+
+    def setUp(self):
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        patches = [
+            mock.patch.multiple(
+                server,
+                API_USERNAME="admin",
+                API_PASSWORD="secret",
+                NW_EXPORT_DIR=export_dir.name,
+                NW_EXPORT_PAGE_SIZE=10,
+            ),
+            mock.patch.object(server, "upstream_client", self.upstream_client),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def upstream_client(self, **kwargs) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle), **kwargs)
+
+    async def finishes(self, awaitable):
+        """Awaits a tool call, failing the test if it hangs."""
+        try:
+            return await asyncio.wait_for(awaitable, HANG_SECONDS)
+        except asyncio.TimeoutError:
+            self.fail(f"the call did not finish within {HANG_SECONDS}s")
+
+    async def cancel_mid_stream(self, coroutine, after: float = 0.3):
+        """Starts a tool call, cancels it while it is streaming (as an MCP cancellation does) and checks that it finishes."""
+        task = asyncio.create_task(coroutine)
+        await asyncio.sleep(after)
+        self.assertFalse(task.done(), "the call finished before it could be cancelled")
+        task.cancel()
+        done, _ = await asyncio.wait({task}, timeout=HANG_SECONDS)
+        self.assertIn(task, done, f"the cancelled call did not finish within {HANG_SECONDS}s")
+        self.assertTrue(task.cancelled())
+
+
+class ExportSessionsTest(StreamingToolTestCase):
+    async def test_writer_failure_with_full_queue(self):
+        def write_batch(writer, sessions, next_id1, pending):
+            # Give the producer time to fill the queue and block on it
+            time.sleep(0.2)
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        with mock.patch.object(SessionExportWriter, "write_batch", write_batch):
+            result = await self.finishes(server.export_sessions(where_clause="service=443", resume=False))
+        self.assertIn("Export Interrupted", result)
+        self.assertIn("No space left on device", result)
+
+    async def test_cancel_with_full_queue(self):
+        def write_batch(writer, sessions, next_id1, pending):
+            # A slow writer, so the producer fills the queue
+            time.sleep(0.05)
+
+        with mock.patch.object(SessionExportWriter, "write_batch", write_batch):
+            await self.cancel_mid_stream(server.export_sessions(where_clause="service=443", resume=False))
+
+
+class DiffMetakeyValuesTest(StreamingToolTestCase):
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if current_window(request.url.params["where"]):
+            # Fail the current window only once the baseline has filled its queue
+            await asyncio.sleep(0.2)
+            return httpx.Response(500, text="internal error")
+        return endless_values(request)
+
+    async def test_current_window_failure_with_full_baseline_queue(self):
+        with mock.patch.object(server, "NW_VALUES_PAGE_SIZE", 2):
+            result = await self.finishes(server.diff_metakey_values("alias.host", time_range="1h", baseline_range="24h"))
+        self.assertIn("500", result)
+
+
+class DiffMetakeyValuesCancelTest(StreamingToolTestCase):
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if current_window(request.url.params["where"]):
+            # The current window pages slowly while the baseline fills its queue
+            await asyncio.sleep(0.01)
+        return endless_values(request)
+
+    async def test_cancel_with_full_baseline_queue(self):
+        with mock.patch.object(server, "NW_VALUES_PAGE_SIZE", 2):
+            await self.cancel_mid_stream(server.diff_metakey_values("alias.host", time_range="1h", baseline_range="24h"))
+
+
+class SimulateEsaRuleTest(StreamingToolTestCase):
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.001)
+        params = request.url.params
+        id1 = int(params.get("id1", 1))
+        size = int(params["size"])
+        fields = []
+        for i in range(id1, id1 + size, 3):
+            fields += [
+                {"id1": i, "type": "time", "value": 1700000000 + i, "group": i},
+                {"id1": i + 1, "type": "ip.src", "value": f"10.0.0.{i % 7}", "group": i},
+                {"id1": i + 2, "type": "ad.username.src", "value": f"user{i % 50}", "group": i},
+            ]
+        return httpx.Response(200, json={"results": {"id1": id1, "id2": id1 + size - 1, "fields": fields}})
+
+    async def test_cancel_mid_stream(self):
+        with mock.patch.object(server, "NW_EXPORT_PAGE_SIZE", 30):
+            await self.cancel_mid_stream(server.simulate_esa_rule("medium=1"))
+
+
+if __name__ == "__main__":
+    unittest.main()